@@ -0,0 +1,215 @@
+import base64
+import html
+import io
+import os
+import threading
+
+from stage_timings import timed
+
+
+# Images are stored at this multiple of their displayed width so they stay sharp on phone screens
+IMAGE_SCALE = 2
+
+# Extensions shown in the image marquee
+MARQUEE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif')
+
+# Logos in the page header, left then right, and the folder of marquee images
+HEADER_LOGOS = ("logos/paraLogo.png", "logos/BalidanBadge.png")
+MARQUEE_FOLDER = 'img'
+
+# Replacements made by html.escape, '&' first, and a pattern matching any of the characters
+HTML_ENTITIES = [('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;')]
+HTML_SPECIAL = '[&<>"\']'
+
+# Encoded images and built HTML, shared by every session and keyed on file mtimes
+_image_cache = {}
+_html_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@timed("image_encode")
+def _encode_image(image_path, width):
+    # Pillow is only needed when an image is not cached yet
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        image.load()
+        target_width = width * IMAGE_SCALE
+        if image.width > target_width:
+            target_height = max(1, round(image.height * target_width / image.width))
+            image = image.resize((target_width, target_height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        # Keep transparency as PNG; photos are much smaller as JPEG
+        if image.mode in ('RGBA', 'LA', 'P') or image_path.lower().endswith(('.png', '.gif')):
+            image.save(buffer, format='PNG', optimize=True)
+            mime = 'image/png'
+        else:
+            image.convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+            mime = 'image/jpeg'
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def image_data_uri(image_path, width):
+    """
+    Returns an image resized for its displayed width as a base64 data URI.
+
+    Parameters:
+        image_path (str): Path of the image file.
+        width (int): Width in pixels the image is displayed at.
+
+    Returns:
+        str or None: None when the image is missing or unreadable.
+    """
+    mtime = _mtime(image_path)
+    if mtime is None:
+        return None
+    key = (image_path, mtime, width)
+    with _cache_lock:
+        uri = _image_cache.get(key)
+    if uri is None:
+        try:
+            uri = _encode_image(image_path, width)
+        except OSError:
+            return None
+        with _cache_lock:
+            # Forget older versions of the same image
+            for stale_key in [k for k in _image_cache if k[0] == image_path and k[2] == width]:
+                del _image_cache[stale_key]
+            _image_cache[key] = uri
+    return uri
+
+
+def _cached_html(name, signature, build):
+    # Rebuild a block of HTML only when the files it was made from change
+    with _cache_lock:
+        cached = _html_cache.get(name)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    html = build()
+    with _cache_lock:
+        _html_cache[name] = (signature, html)
+    return html
+
+
+def _logo_tag(image_path, alt, width):
+    uri = image_data_uri(image_path, width)
+    if uri is None:
+        return ''
+    return f'<img src="{uri}" alt="{alt}" style="width:{width}px;"/>'
+
+
+@timed()
+def header_html(left_logo, right_logo):
+    # Page header with the two logos and the canteen name
+    def build():
+        return f"""
+    <div class="header-container" style="display: flex; justify-content: space-between; align-items: center; background-color: #4CAF50; padding: 20px; border-radius: 8px;">
+        <!-- Left logo -->
+        <div style="flex: 1; display: flex; justify-content: flex-start; align-items: center;">
+            {_logo_tag(left_logo, "Left Logo", 100)}
+        </div>
+        <!-- Title and Subtitle -->
+        <div style="flex: 2; text-align: center;">
+            <div class="header-title" style="font-size: 28px; color: white;"><b>UNIT RUN CANTEEN</b></div>
+            <div class="header-subtitle" style="font-size: 18px; color: white;"><b>THE PARACHUTE REGIMENT TRAINING CENTRE</b></div>
+        </div>
+        <!-- Right logo -->
+        <div style="flex: 1; display: flex; justify-content: flex-end; align-items: center;">
+            {_logo_tag(right_logo, "Right Logo", 80)}
+        </div>
+    </div>
+"""
+    return _cached_html('header', (_mtime(left_logo), _mtime(right_logo)), build)
+
+
+def marquee_images(image_folder):
+    if not os.path.isdir(image_folder):
+        return []
+    return sorted(f for f in os.listdir(image_folder) if f.endswith(MARQUEE_EXTENSIONS))
+
+
+@timed()
+def marquee_html(image_folder):
+    """
+    Returns the scrolling image marquee for every image in a folder.
+
+    Parameters:
+        image_folder (str): Folder holding the marquee images.
+
+    Returns:
+        str: The marquee HTML, or an empty string when the folder has no images.
+    """
+    image_files = marquee_images(image_folder)
+    signature = tuple((image, _mtime(os.path.join(image_folder, image))) for image in image_files)
+
+    def build():
+        uris = [image_data_uri(os.path.join(image_folder, image), 100) for image in image_files]
+        # Increased margin between images
+        images_html = ''.join(f'<img src="{uri}" style="margin: 0 40px; width: 100px;">' for uri in uris if uri)
+        if not images_html:
+            return ''
+        # Duplicate the images to ensure a continuous loop
+        continuous_images_html = images_html * 3
+        return f"""
+        <style>
+            .marquee {{
+                overflow: hidden;
+                white-space: nowrap;
+                box-sizing: border-box;
+            }}
+        </style>
+        <div class="marquee">
+            <marquee behavior="scroll" direction="left" scrollamount="5">
+                {continuous_images_html}
+            </marquee>
+        </div>
+        """
+
+    return _cached_html(('marquee', image_folder), signature, build)
+
+
+@timed()
+def table_html(data):
+    """
+    Returns a DataFrame as a plain HTML table styled by the .stock-table CSS.
+
+    Row banding comes from the stylesheet, so no per-row or per-cell style is
+    computed or sent to the browser. The cells are escaped and joined a whole
+    column at a time by Arrow compute functions, with no Python code run per
+    row or per cell.
+
+    Parameters:
+        data (DataFrame): Rows to show, normally one page of the catalog.
+
+    Returns:
+        str: The table HTML.
+    """
+    # Imported on first use, like the other heavy modules, so the page script starts quickly
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    header = ''.join(f'<th>{html.escape(str(column))}</th>' for column in data.columns)
+    body = ''
+    if len(data):
+        cells = []
+        for _, values in data.items():
+            # Same text as html.escape(str(value)) gives for each value
+            if pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans:
+                text = pc.cast(pa.array(values), pa.string())
+            else:
+                text = pa.array(values.astype(str).to_numpy(dtype=object), type=pa.string())
+            if pc.any(pc.match_substring_regex(text, HTML_SPECIAL)).as_py():
+                for char, entity in HTML_ENTITIES:
+                    text = pc.replace_substring(text, char, entity)
+            cells.append(text)
+        rows = pc.binary_join_element_wise('<tr><td>', *[x for cell in cells for x in (cell, '</td><td>')][:-1], '</td></tr>', '')
+        body = pc.binary_join(pa.ListArray.from_arrays(pa.array([0, len(rows)], type=pa.int32()), rows), '')[0].as_py()
+    return f'<div class="stock-table-wrapper"><table class="stock-table"><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table></div>'
@@ -0,0 +1,15 @@
+# Benchmarks for the stock catalog app. Run a module from the repository root, e.g.
+#   python -m benchmarks.table_render
+import time
+
+
+def best_time(func, repeat=3):
+    # Fastest of several runs, and the result of the last one
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,133 @@
+"""
+Times a cold start: importing the app's modules, and the first page view of a fresh process.
+
+Every measurement runs in a new Python process, as after a server restart,
+working in a temporary directory that holds a stock upload with its snapshot
+already built. "first_render" is the first run of the page script with
+nothing warmed; "first_render_warmed" runs serve.warmup first, as serve.py
+does when the server starts, and reports the warmup time separately.
+
+Run from the repository root:
+    python -m benchmarks.cold_start [rows] [--repeat N] [--output FILE]
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+DEFAULT_ROWS = 20000
+DEFAULT_REPEAT = 3
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(REPO_DIR, "csdProductAvaibility.py")
+
+
+def script_imports():
+    # Modules the page script imports on every run, i.e. its top-level import statements
+    with open(APP_SCRIPT, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _child(mode):
+    # Runs in the fresh process; the server has Streamlit loaded before any script runs
+    import streamlit  # noqa: F401
+
+    result = {}
+    if mode == "imports":
+        start = time.perf_counter()
+        for module in script_imports():
+            importlib.import_module(module)
+        result["seconds"] = time.perf_counter() - start
+    else:
+        from streamlit.testing.v1 import AppTest
+        if mode == "first_render_warmed":
+            import serve
+            start = time.perf_counter()
+            serve.warmup()
+            result["warmup_seconds"] = time.perf_counter() - start
+        at = AppTest.from_file(APP_SCRIPT, default_timeout=300)
+        start = time.perf_counter()
+        at.run()
+        result["seconds"] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    print(json.dumps(result))
+
+
+def _run_child(mode):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", mode],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT):
+    """
+    Times each cold-start measurement in fresh processes.
+
+    Parameters:
+        rows (int): Rows in the synthetic stock workbook.
+        repeat (int): Fresh processes per measurement; the medians are reported.
+
+    Returns:
+        list: Result entries.
+    """
+    # Imported here, not at the top: the fresh processes must not load the app's modules before timing them
+    from benchmarks.fragment_reruns import STOCK_FILE, _app_dir
+
+    modes = ["imports", "first_render"]
+    if os.path.exists(os.path.join(REPO_DIR, "serve.py")):
+        modes.append("first_render_warmed")
+    results = []
+    with _app_dir(rows):
+        # A restarted server finds the snapshots built before it stopped
+        sys.path.insert(0, REPO_DIR)
+        import stock_catalog
+        stock_catalog.get_catalog(os.path.join("uploaded_files", STOCK_FILE))
+
+        for mode in modes:
+            runs = [_run_child(mode) for _ in range(repeat)]
+            entry = {"benchmark": "cold_start", "path": mode, "rows": rows,
+                     "seconds": round(statistics.median(r["seconds"] for r in runs), 4)}
+            if "warmup_seconds" in runs[0]:
+                entry["warmup_seconds"] = round(statistics.median(r["warmup_seconds"] for r in runs), 4)
+            results.append(entry)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time imports and the first page view of a fresh process.")
+    parser.add_argument("rows", nargs="?", type=int, default=DEFAULT_ROWS, help="rows in the stock workbook")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="fresh processes per measurement")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child)
+        return
+    results = run(args.rows, args.repeat)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Times the server work behind each widget interaction, with and without fragments.
+
+The search box, stock tables, demand form and admin tools are Streamlit
+fragments, so using one of their widgets reruns only that function. Before
+they were fragments every interaction reran the whole script. For each
+interaction this drives the app with Streamlit's AppTest, then reports the
+time of the whole script run ("full_rerun_seconds", the cost before) and of
+the fragment that owns the widget ("fragment_seconds", the cost now).
+
+Run from the repository root:
+    python -m benchmarks.fragment_reruns [rows] [--repeat N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+import search_tracking
+import stage_timings
+from benchmarks.hot_paths import APP_DIRS
+from benchmarks.synthetic import write_stock_workbook
+
+
+DEFAULT_ROWS = 20000
+DEFAULT_REPEAT = 5
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "csdProductAvaibility.py")
+STOCK_FILE = "CANTEEN_STOCK_SUMMARY_01-01-2026.xlsx"
+
+
+@contextmanager
+def _app_dir(rows):
+    # A temporary working directory with a stock upload and the images the page shows
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="csd-bench-") as path:
+        os.chdir(path)
+        try:
+            for directory in APP_DIRS + ["uploaded_files", "logos", "img"]:
+                os.makedirs(directory, exist_ok=True)
+            Image.new("RGBA", (400, 400), (200, 0, 0, 255)).save("logos/paraLogo.png")
+            Image.new("RGBA", (400, 400), (0, 120, 0, 255)).save("logos/BalidanBadge.png")
+            for k in range(3):
+                Image.new("RGB", (1200, 900), (k * 60, 0, 0)).save(f"img/photo{k}.jpg")
+            write_stock_workbook(os.path.join("uploaded_files", STOCK_FILE), rows)
+            yield path
+        finally:
+            # Searches logged in the background must land in this directory, not the caller's
+            search_tracking.flush_search_log()
+            os.chdir(previous)
+
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def _interact(at, action, fragment):
+    # Run one interaction and return the whole-script and fragment times, in seconds
+    stage_timings.clear_timings()
+    action(at)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    timings = stage_timings.get_timings()
+    script = timings.loc[timings["Stage"] == "script", "Milliseconds"]
+    # A full run renders one stock table per file; a fragment rerun renders only one of them
+    region = timings.loc[timings["Stage"] == fragment, "Milliseconds"]
+    return script.sum() / 1000, region.mean() / 1000
+
+
+def _search_prefix(at):
+    _widget(at.text_input, "Search Item").input("AMUL").run()
+
+
+def _search_select(at):
+    box = _widget(at.selectbox, "Matching items")
+    box.select(box.options[1]).run()
+
+
+def _table_page(at):
+    page = _widget(at.number_input, "Page")
+    page.set_value(page.value % 5 + 1).run()
+
+
+def _table_sort(at):
+    order = _widget(at.radio, "Order")
+    order.set_value("Descending" if order.value == "Ascending" else "Ascending").run()
+
+
+def _demand_submit(at):
+    values = {"service_no": "JC-1234", "name": "Bench", "product_name": "AMUL BUTTER 100G",
+              "mobile_no": "9876543210", "address": "Lines"}
+    for key, value in values.items():
+        at.text_input(key=key).input(value) if key != "address" else at.text_area(key=key).input(value)
+    _widget(at.button, "Submit").click().run()
+
+
+# (name, page, action, fragment stage)
+INTERACTIONS = [
+    ("search_prefix", "home", _search_prefix, "render_search_box"),
+    ("search_select", "home", _search_select, "render_search_box"),
+    ("table_page", "admin", _table_page, "render_stock_table"),
+    ("table_sort", "admin", _table_sort, "render_stock_table"),
+    ("demand_submit", "demand", _demand_submit, "render_demand_form"),
+]
+
+
+def _open_page(page):
+    at = AppTest.from_file(APP_SCRIPT, default_timeout=300)
+    at.run()
+    if page == "admin":
+        _widget(at.button, "Admin").click().run()
+        at.sidebar.text_input[0].input("admin")
+        at.sidebar.text_input[1].input("Anildaya")
+        at.sidebar.button[0].click().run()
+        # The stock tables show once a file has been uploaded in this session
+        at.session_state["file_path"] = os.path.join("uploaded_files", STOCK_FILE)
+        at.run()
+    elif page == "demand":
+        _widget(at.button, "Demand").click().run()
+    return at
+
+
+def run(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT):
+    """
+    Times each interaction as a whole-script rerun and as a fragment rerun.
+
+    Parameters:
+        rows (int): Rows in the synthetic stock workbook.
+        repeat (int): Times each interaction is repeated; the medians are reported.
+
+    Returns:
+        list: Result entries, one per interaction.
+    """
+    # The app modules are imported by the script from the repository root
+    sys.path.insert(0, os.path.dirname(APP_SCRIPT))
+    was_enabled = stage_timings.timings_enabled()
+    stage_timings.enable_timings(True)
+    results = []
+    try:
+        with _app_dir(rows):
+            pages = {}
+            for name, page, action, fragment in INTERACTIONS:
+                if page not in pages:
+                    pages[page] = _open_page(page)
+                full, region = zip(*(_interact(pages[page], action, fragment) for _ in range(repeat)))
+                results.append({
+                    "benchmark": "interaction", "interaction": name, "fragment": fragment, "rows": rows,
+                    "full_rerun_seconds": round(statistics.median(full), 6),
+                    "fragment_seconds": round(statistics.median(region), 6),
+                })
+    finally:
+        stage_timings.enable_timings(was_enabled)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time widget interactions as full reruns and as fragment reruns.")
+    parser.add_argument("rows", nargs="?", type=int, default=DEFAULT_ROWS, help="rows in the stock workbook")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per interaction")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.repeat)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
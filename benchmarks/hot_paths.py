@@ -0,0 +1,215 @@
+"""
+Times the load, process, search and search-log hot paths on synthetic workbooks,
+and loading several workbooks one after another versus in parallel.
+
+Every run works in a temporary directory, so the app's own uploads, snapshots
+and search log are never touched. Results are printed as JSON, one entry per
+measurement, so runs can be saved and compared over time.
+
+Run from the repository root:
+    python -m benchmarks.hot_paths [rows ...] [--history EVENTS] [--files N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import closing, contextmanager
+
+import search_tracking
+import stock_catalog
+import stock_history
+from benchmarks import best_time
+from benchmarks.synthetic import make_search_history, write_stock_workbook
+
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+DEFAULT_HISTORY = 50000
+DEFAULT_FILES = 4
+
+# Searches timed per catalog size, and searches logged per search-log measurement
+SEARCHES = 20
+LOGGED_SEARCHES = 200
+QUEUED_SEARCHES = 2000
+
+# Directories the app modules expect relative to the working directory
+APP_DIRS = [stock_catalog.SNAPSHOT_DIR, stock_catalog.STAGING_DIR, search_tracking.LOG_DIR, stock_history.HISTORY_DIR]
+
+
+@contextmanager
+def _scratch_dir():
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="csd-bench-") as path:
+        os.chdir(path)
+        try:
+            for directory in APP_DIRS:
+                os.makedirs(directory, exist_ok=True)
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+def _result(benchmark, path, rows, seconds, **extra):
+    return {"benchmark": benchmark, "path": path, "rows": rows, "seconds": round(seconds, 6), **extra}
+
+
+def _search_terms(processed, seed=0):
+    # Real descriptions, single words and terms full of regex metacharacters
+    rnd = random.Random(seed)
+    descriptions = processed['Item Description'].tolist()
+    terms = rnd.sample(descriptions, min(len(descriptions), SEARCHES // 2))
+    terms += [description.split()[1] for description in rnd.sample(descriptions, min(len(descriptions), SEARCHES // 4))]
+    terms += ["(500G)", "1+1", "PACK OF 6", "NO SUCH ITEM"]
+    return terms[:SEARCHES]
+
+
+def bench_catalog(rows, seed=0):
+    """
+    Times load_data, process_data, search_data and get_items on one workbook size.
+
+    Parameters:
+        rows (int): Rows in the synthetic workbook.
+        seed (int): Random seed for the workbook.
+
+    Returns:
+        list: Result entries.
+    """
+    results = []
+    path = write_stock_workbook(f"CANTEEN_STOCK_SUMMARY_{rows}.xlsx", rows, seed)
+    repeat = 3 if rows <= 10000 else 1
+
+    seconds, data = best_time(lambda: stock_catalog.load_data(path), repeat)
+    results.append(_result("load_data", "pandas_read_excel", rows, seconds))
+    seconds, processed = best_time(lambda: stock_catalog.process_data(data), 3)
+    results.append(_result("process_data", "vectorized", rows, seconds, output_rows=len(processed)))
+
+    terms = _search_terms(processed, seed)
+    seconds = sum(best_time(lambda: stock_catalog.search_data(processed, term), 3)[0] for term in terms)
+    results.append(_result("search_data", "str_contains", rows, seconds / len(terms), searches=len(terms)))
+
+    # get_items from nothing, from the Parquet snapshot, and from the in-memory cache
+    stock_catalog.invalidate_catalog()
+    stock_catalog.delete_snapshot(path)
+    start = time.perf_counter()
+    items = stock_catalog.get_items(path)
+    results.append(_result("get_items", "build_snapshot", rows, time.perf_counter() - start, items=len(items)))
+    stock_catalog.invalidate_catalog()
+    start = time.perf_counter()
+    stock_catalog.get_items(path)
+    results.append(_result("get_items", "read_snapshot", rows, time.perf_counter() - start))
+    seconds, _ = best_time(lambda: stock_catalog.get_items(path), 3)
+    results.append(_result("get_items", "cached", rows, seconds))
+
+    # The indexed search the app uses, for comparison with search_data
+    catalog = stock_catalog.get_catalog(path)
+    seconds = sum(best_time(lambda: stock_catalog.search_catalog(catalog, term), 3)[0] for term in terms)
+    results.append(_result("search_data", "search_index", rows, seconds / len(terms), searches=len(terms)))
+    stock_catalog.invalidate_catalog()
+    return results
+
+
+def bench_multi_file(rows, files):
+    """
+    Times loading several workbooks with get_catalog one at a time and with get_catalogs.
+
+    Parameters:
+        rows (int): Rows in each synthetic workbook.
+        files (int): Number of workbooks.
+
+    Returns:
+        list: Result entries; 'seconds' is the time to load all the files.
+    """
+    os.makedirs("depots", exist_ok=True)
+    paths = [write_stock_workbook(os.path.join("depots", f"DEPOT_{k}.xlsx"), rows, seed=k) for k in range(files)]
+
+    def reset():
+        stock_catalog.invalidate_catalog()
+        for path in paths:
+            stock_catalog.delete_snapshot(path)
+
+    reset()
+    start = time.perf_counter()
+    for path in paths:
+        stock_catalog.get_catalog(path)
+    results = [_result("load_files", "serial", rows, time.perf_counter() - start, files=files)]
+
+    # Includes starting the worker processes, which every batch of new files pays
+    reset()
+    start = time.perf_counter()
+    stock_catalog.get_catalogs(paths)
+    results.append(_result("load_files", "process_pool", rows, time.perf_counter() - start,
+                           files=files, workers=min(files, stock_catalog.PARSE_WORKERS)))
+
+    start = time.perf_counter()
+    merged = stock_catalog.get_merged_catalog("depots")
+    results.append(_result("load_files", "merge", rows, time.perf_counter() - start, files=files, merged_rows=len(merged.processed)))
+    stock_catalog.invalidate_catalog()
+    return results
+
+
+def bench_search_log(history_events, seed=0):
+    """
+    Times log_search and log_search_async against a search log with existing history.
+
+    Parameters:
+        history_events (int): Searches already in the log before timing starts.
+        seed (int): Random seed for the history.
+
+    Returns:
+        list: Result entries; 'seconds' is the time per logged search.
+    """
+    rnd = random.Random(seed)
+    descriptions = [f"ITEM {i}" for i in range(5000)]
+    history = make_search_history(history_events, descriptions, seed)
+    with closing(search_tracking._db.connect()) as conn:
+        search_tracking._record(conn, history)
+
+    terms = rnd.choices(descriptions, k=LOGGED_SEARCHES)
+    start = time.perf_counter()
+    for term in terms:
+        search_tracking.log_search(term)
+    seconds = (time.perf_counter() - start) / LOGGED_SEARCHES
+    results = [_result("log_search", "sqlite_sync", None, seconds, history_events=history_events)]
+
+    terms = rnd.choices(descriptions, k=QUEUED_SEARCHES)
+    start = time.perf_counter()
+    for term in terms:
+        search_tracking.log_search_async(term)
+    enqueued = time.perf_counter() - start
+    search_tracking.flush_search_log()
+    drained = time.perf_counter() - start
+    results.append(_result("log_search", "background_enqueue", None, enqueued / QUEUED_SEARCHES,
+                           history_events=history_events, drain_seconds=round(drained, 4)))
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, history_events=DEFAULT_HISTORY, files=DEFAULT_FILES):
+    with _scratch_dir():
+        results = []
+        for rows in sizes:
+            results.extend(bench_catalog(rows))
+        if files > 1:
+            results.extend(bench_multi_file(min(sizes), files))
+        results.extend(bench_search_log(history_events))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths on synthetic data.")
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES, help="workbook rows, e.g. 1000 200000")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY, help="searches already in the search log")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES, help="workbooks loaded together, at the smallest size")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.history, args.files)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Synthetic CANTEEN_STOCK_SUMMARY workbooks and search-log histories for the benchmarks.
+
+The data imitates what depot exports look like: section separator rows made of
+dashes, Index No values that are numbers, text, codes with special characters
+or missing, and rates and closing stock that are zero, blank or not numbers.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+BRANDS = ["AMUL", "DOVE", "RIN", "TATA", "NESTLE", "BRITANNIA", "PARLE", "LIFEBUOY", "COLGATE", "MAGGI", "HALDIRAM", "SURF"]
+PRODUCTS = ["BUTTER", "SOAP", "TEA", "BISCUIT", "OIL", "RICE", "DAL", "SUGAR", "SHAMPOO", "NOODLES", "TOOTHPASTE", "DETERGENT"]
+SIZES = ["100G", "(500G)", "1KG", "200ML", "1 LTR", "PACK OF 6", "1+1", "5KG"]
+SECTIONS = ["GROCERY", "TOILETRIES", "BEVERAGES", "LIQUOR", "ELECTRONICS", "STATIONERY"]
+
+# Other columns of a real export; the app does not read them but pandas still has to
+EXTRA_COLUMNS = ["Opening", "Receipt", "Issue", "Value"]
+
+
+def item_description(rnd, i):
+    return f"{rnd.choice(BRANDS)} {rnd.choice(PRODUCTS)} {rnd.choice(SIZES)} {i}"
+
+
+def _index_no(rnd, i):
+    roll = rnd.random()
+    if roll < 0.70:
+        return 10000 + i
+    if roll < 0.80:
+        return str(10000 + i)
+    if roll < 0.85:
+        return float(10000 + i)
+    if roll < 0.92:
+        return f"{10000 + i}/{rnd.choice('ABC')}"  # Special characters: dropped by process_data
+    if roll < 0.96:
+        return f"CSD-{i}"
+    return None
+
+
+def _rate(rnd):
+    roll = rnd.random()
+    if roll < 0.08:
+        return 0
+    if roll < 0.10:
+        return None
+    if roll < 0.12:
+        return rnd.choice(["N/A", "0", "12.50", "TBD"])
+    return round(rnd.uniform(5, 900), 2)
+
+
+def _closing(rnd):
+    roll = rnd.random()
+    if roll < 0.20:
+        return 0
+    if roll < 0.23:
+        return None
+    if roll < 0.24:
+        return "NIL"
+    return rnd.randint(1, 500)
+
+
+def make_stock_sheet(rows, seed=0):
+    """
+    Builds a stock summary with the columns and value mix of a depot export.
+
+    Parameters:
+        rows (int): Number of rows, separator rows included.
+        seed (int): Random seed; the same seed always gives the same sheet.
+
+    Returns:
+        DataFrame: The sheet as it would be read back from the workbook.
+    """
+    rnd = random.Random(seed)
+    records = []
+    for i in range(rows):
+        if i % 250 == 0:
+            # A section heading between dashed separators, as the exports have
+            records.append({"Index No": None, "Item Description": f"----- {rnd.choice(SECTIONS)} -----",
+                            "RRATE": None, "Closing": None})
+            continue
+        description = item_description(rnd, i) if rnd.random() > 0.01 else None
+        records.append({"Index No": _index_no(rnd, i), "Item Description": description,
+                        "RRATE": _rate(rnd), "Closing": _closing(rnd)})
+    sheet = pd.DataFrame(records)
+    for column in EXTRA_COLUMNS:
+        sheet[column] = [rnd.randint(0, 1000) for _ in range(rows)]
+    return sheet
+
+
+def write_stock_workbook(path, rows, seed=0):
+    # Save a synthetic stock summary the way an admin would upload it
+    make_stock_sheet(rows, seed).to_excel(path, index=False)
+    return path
+
+
+def make_search_history(events, descriptions, seed=0, days=90):
+    """
+    Builds a search-log history in which a few items get most of the searches.
+
+    Parameters:
+        events (int): Number of searches.
+        descriptions (list): Item descriptions that can be searched for.
+        seed (int): Random seed.
+        days (int): Period the searches are spread over, ending now.
+
+    Returns:
+        list: (search term, timestamp) pairs, oldest first.
+    """
+    rnd = random.Random(seed)
+    descriptions = list(descriptions)
+    # Zipf-like popularity: the n-th item is searched about 1/n as often as the first
+    weights = [1 / (rank + 1) for rank in range(len(descriptions))]
+    terms = rnd.choices(descriptions, weights=weights, k=events)
+    start = datetime.now() - timedelta(days=days)
+    offsets = sorted(rnd.uniform(0, days * 86400) for _ in range(events))
+    return [
+        (term, (start + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S"))
+        for term, offset in zip(terms, offsets)
+    ]
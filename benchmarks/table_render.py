@@ -0,0 +1,76 @@
+"""
+Compares the old Styler-banded st.dataframe payload with the CSS-banded HTML table.
+
+Run from the repository root:
+    python -m benchmarks.table_render [rows ...]
+"""
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+from streamlit.elements.arrow import marshall
+from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+
+from assets import table_html
+from benchmarks import best_time
+
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def legacy_color_banded_rows(row):
+    # The per-row styling function the app used before the CSS banding
+    return [
+        'background-color: #f9f5e3; color: #333333' if row.name % 2 == 0 else 'background-color: #ffffff; color: #333333'] * len(
+        row)
+
+
+def make_processed(rows, seed=0):
+    # A processed catalog frame with the same columns and value shapes as process_data output
+    rng = np.random.default_rng(seed)
+    prices = np.char.mod('%.2f', rng.uniform(5, 900, rows).round(2)).astype(object)
+    prices[rng.random(rows) < 0.1] = 'Soon Available'
+    return pd.DataFrame({
+        'S.No': np.arange(1, rows + 1),
+        'Index No': (rng.integers(10000, 99999, rows)).astype(str),
+        'Item Description': [f"ITEM {i} PACK OF {i % 12 + 1} (500G)" for i in range(rows)],
+        'Price': prices,
+        'Available': np.where(rng.random(rows) < 0.8, 'YES', 'SOON AVAILABLE'),
+    })
+
+
+def _styler_payload(data):
+    proto = ArrowProto()
+    marshall(proto, data.style.apply(legacy_color_banded_rows, axis=1), "bench")
+    return proto.ByteSize()
+
+
+def _arrow_payload(data):
+    proto = ArrowProto()
+    marshall(proto, data)
+    return proto.ByteSize()
+
+
+def _html_payload(data):
+    return len(table_html(data).encode('utf-8'))
+
+
+def run(sizes=DEFAULT_SIZES):
+    results = []
+    for rows in sizes:
+        data = make_processed(rows)
+        for name, func in (("styler_dataframe", _styler_payload), ("arrow_dataframe", _arrow_payload), ("css_html_table", _html_payload)):
+            seconds, payload = best_time(lambda: func(data))
+            results.append({"benchmark": "table_render", "path": name, "rows": rows, "seconds": round(seconds, 4), "payload_bytes": payload})
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    sizes = [int(size) for size in argv] or DEFAULT_SIZES
+    print(json.dumps(run(sizes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
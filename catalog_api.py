@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import threading
+
+import tornado.web
+from tornado.ioloop import IOLoop
+
+from stock_catalog import SOURCE_COLUMN, UPLOAD_DIR, fuzzy_search_catalog, get_merged_catalog, search_catalog, stock_files
+
+# Port the API listens on when run on its own
+API_PORT = 8502
+
+# Search results returned when the request does not ask for a number, and the most it may ask for
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+_server_lock = threading.Lock()
+_server_thread = None
+# Why the server could not start; kept so that later calls do not try again
+_server_error = None
+
+
+def item_json(row):
+    # One catalog row as returned by the API
+    return {
+        'index_no': row['Index No'],
+        'description': row['Item Description'],
+        'price': row['Price'],
+        'available': row['Available'] == 'YES',
+        'source': row[SOURCE_COLUMN],
+    }
+
+
+class CatalogHandler(tornado.web.RequestHandler):
+    """
+    Base handler serving the live catalog, merged over every stock file, as JSON.
+
+    Responses carry an ETag made from the stock file versions and the request
+    URI, so a client sending it back in If-None-Match gets an empty 304 until
+    new stock is uploaded.
+    """
+
+    def initialize(self, upload_dir):
+        self.upload_dir = upload_dir
+        self.catalog = None
+        self.version = None
+
+    def set_default_headers(self):
+        self.set_header('Access-Control-Allow-Origin', '*')
+        # Clients may keep responses but must check the ETag before reusing them
+        self.set_header('Cache-Control', 'no-cache')
+
+    async def prepare(self):
+        versions = []
+        for path in stock_files(self.upload_dir):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            versions.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+        if not versions:
+            raise tornado.web.HTTPError(503, reason="No stock file has been uploaded")
+
+        self.version = ",".join(versions)
+        self.set_etag_header()
+        if self.check_etag_header():
+            # The client already has this response; skip the catalog entirely
+            self.set_status(304)
+            self.finish()
+            return
+
+        # Loading new stock files can take seconds; other requests are served meanwhile
+        self.catalog = await IOLoop.current().run_in_executor(None, get_merged_catalog, self.upload_dir)
+        if self.catalog is None:
+            raise tornado.web.HTTPError(503, reason="The stock file could not be loaded")
+
+    def compute_etag(self):
+        if self.version is None:
+            return None
+        digest = hashlib.sha1(f"{self.version}\n{self.request.uri}".encode('utf-8')).hexdigest()
+        return f'"{digest[:20]}"'
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({'error': self._reason})
+
+    def get_limit(self):
+        try:
+            limit = int(self.get_query_argument('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="limit must be a number")
+        return max(1, min(limit, MAX_LIMIT))
+
+
+class SearchHandler(CatalogHandler):
+    # GET /api/search?q=<text>&limit=<n>&fuzzy=1
+    # Every word of q must appear in the description, in any order
+    def get(self):
+        query = self.get_query_argument('q', '').strip()
+        limit = self.get_limit()
+        if self.get_query_argument('fuzzy', '0') in ('1', 'true', 'yes'):
+            results = fuzzy_search_catalog(self.catalog, query, limit=limit)
+        else:
+            results = search_catalog(self.catalog, query, all_words=True)
+        total = len(results)
+        self.write({
+            'version': self.version,
+            'query': query,
+            'total': total,
+            'items': [item_json(row) for row in results.head(limit).to_dict('records')],
+        })
+
+
+class CompleteHandler(CatalogHandler):
+    # GET /api/complete?q=<typed text>&limit=<n>
+    def get(self):
+        query = self.get_query_argument('q', '')
+        self.write({
+            'version': self.version,
+            'query': query,
+            'completions': self.catalog.completer.complete(query, self.get_limit()),
+        })
+
+
+class ItemHandler(CatalogHandler):
+    # GET /api/items/<index no>
+    def get(self, index_no):
+        processed = self.catalog.processed
+        rows = processed[processed['Index No'] == index_no] if not processed.empty else processed
+        if rows.empty:
+            raise tornado.web.HTTPError(404, reason=f"No item with Index No {index_no}")
+        self.write({'version': self.version, 'item': item_json(rows.iloc[0])})
+
+
+class AvailabilityHandler(CatalogHandler):
+    # GET /api/availability?index_no=<a>,<b>&index_no=<c>
+    def get(self):
+        wanted = [
+            index_no.strip()
+            for argument in self.get_query_arguments('index_no')
+            for index_no in argument.split(',') if index_no.strip()
+        ]
+        if not wanted:
+            raise tornado.web.HTTPError(400, reason="index_no is required")
+        processed = self.catalog.processed
+        found = {}
+        if not processed.empty:
+            # An item listed in several stock files is available if any of them has it
+            rows = processed[processed['Index No'].isin(wanted)]
+            found = (rows['Available'] == 'YES').groupby(rows['Index No']).any().to_dict()
+        # Unknown items are reported as null rather than left out
+        self.write({
+            'version': self.version,
+            'availability': {index_no: bool(found[index_no]) if index_no in found else None for index_no in wanted},
+        })
+
+
+def make_app(upload_dir=UPLOAD_DIR):
+    """
+    Builds the read-only catalog API.
+
+    Parameters:
+        upload_dir (str): Directory holding the live stock workbooks.
+
+    Returns:
+        tornado.web.Application: The application, ready to listen on a port.
+    """
+    settings = {'upload_dir': upload_dir}
+    return tornado.web.Application([
+        (r"/api/search", SearchHandler, settings),
+        (r"/api/complete", CompleteHandler, settings),
+        (r"/api/items/([^/]+)", ItemHandler, settings),
+        (r"/api/availability", AvailabilityHandler, settings),
+    ])
+
+
+def start_api_server(port=API_PORT, upload_dir=UPLOAD_DIR):
+    """
+    Starts the API on a background thread of the current process, once.
+
+    Running it inside the Streamlit process lets it answer from the catalog
+    cache the app already holds. The app calls this on every run; only the
+    first call does anything, whether or not the server could be started.
+
+    Parameters:
+        port (int): Port to listen on.
+        upload_dir (str): Directory holding the live stock workbooks.
+
+    Returns:
+        str or None: Why the server could not be started, such as the port being in use.
+    """
+    global _server_thread
+    with _server_lock:
+        if _server_thread is not None:
+            return _server_error
+        started = threading.Event()
+
+        def serve():
+            async def main():
+                global _server_error
+                try:
+                    make_app(upload_dir).listen(port)
+                except Exception as e:
+                    # Typically the port is taken, by the standalone API or another app process
+                    _server_error = f"Catalog API could not listen on port {port}: {e}"
+                    print(_server_error)
+                    return
+                finally:
+                    started.set()
+                await asyncio.Event().wait()
+
+            asyncio.run(main())
+
+        _server_thread = threading.Thread(target=serve, name="catalog-api", daemon=True)
+        _server_thread.start()
+        started.wait(5)
+        return _server_error
+
+
+async def _serve_forever(port, upload_dir):
+    make_app(upload_dir).listen(port)
+    print(f"Catalog API listening on port {port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the stock catalog as JSON.")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--upload-dir", default=UPLOAD_DIR)
+    args = parser.parse_args()
+    asyncio.run(_serve_forever(args.port, args.upload_dir))
@@ -1,53 +1,61 @@
+import time
+# Started before the other imports so the rerun timing covers the whole script
+script_started = time.perf_counter()
 import streamlit as st
 import pandas as pd
+import html
 import os
-import re
-import time
-import base64
-from datetime import datetime
-from demand_panel import save_demand_data
-from search_tracking import log_search
+from datetime import datetime, timedelta
+from assets import HEADER_LOGOS, MARQUEE_FOLDER, header_html, marquee_html, table_html
+from exports import EXPORT_FORMATS, export_file_name
+from demand_panel import demand_totals, export_demand_data, fulfillable_demands, mark_demands_fulfilled, match_new_demands, save_demand_data, update_demand_matches
+from stage_timings import clear_timings, enable_timings, export_timings, record_startup, record_timing, since_process_start, startup_timings, timed, timing_summary, timings_enabled
+from stock_history import changes_since, last_delta, list_versions
+from search_tracking import export_search_log, log_search_async, search_popularity, search_trend, top_search_terms, unavailable_searches
+from stock_catalog import UPLOAD_DIR, complete_items, delete_stock_file, fuzzy_search_catalog, get_catalogs, get_merged_catalog, page_rows, search_catalog, stage_upload
+# Only the first run of the process really imports anything; later runs find the modules loaded
+record_startup("script_imports", time.perf_counter() - script_started)
 # Define your admin credentials (for simplicity, hard-coded here)
 st.set_page_config(layout="wide")
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "Anildaya"
 
-# Directory to store uploaded files
-UPLOAD_DIR = "uploaded_files"
-DEMAND_DIR = "Demand_stock"
-
-# Ensure the directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(DEMAND_DIR, exist_ok=True)
-def download_demand_data():
-    demand_files = os.listdir(DEMAND_DIR)
-    if demand_files:
-        for demand_file in demand_files:
-            file_path = os.path.join(DEMAND_DIR, demand_file)
-            with open(file_path, "rb") as f:
-                st.download_button(
-                    label=f"Download {demand_file}",
-                    data=f,
-                    file_name=demand_file,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key=f"download_{demand_file}"  # Unique key for each file
-                )
+# Optional JSON API for kiosks and bots, answered from this process's catalog cache
+if os.environ.get("CSD_API_PORT"):
+    from catalog_api import start_api_server
+    start_api_server(int(os.environ["CSD_API_PORT"]), UPLOAD_DIR)
+def _date_range(dates):
+    # (first day, last day) to the (since, until) times the exports filter on; None means the whole history
+    if dates is None:
+        return None, None
+    first, last = dates
+    return datetime.combine(first, datetime.min.time()), datetime.combine(last, datetime.min.time()) + timedelta(days=1)
+
+
+def download_demand_data(fmt="xlsx", dates=None):
+    # The file is built from the demand database when requested, and reused until a new demand arrives
+    demand_data = export_demand_data(fmt, *_date_range(dates))
+    if demand_data is not None:
+        st.download_button(
+            label="Download demand data",
+            data=demand_data,
+            file_name=export_file_name("demand_data", fmt, dates),
+            mime=EXPORT_FORMATS[fmt][1],
+            key="download_demand_data"
+        )
     else:
         st.write("No demand data available to download.")
-def download_search_log():
-    SEARCH_LOG_DIR = "search_log"
-    log_files = os.listdir(SEARCH_LOG_DIR)
-    if log_files:
-        for log_file in log_files:
-            file_path = os.path.join(SEARCH_LOG_DIR, log_file)
-            with open(file_path, "rb") as f:
-                st.download_button(
-                    label="Download Search Log",
-                    data=f,
-                    file_name="search_log.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key="download_search_log"  # Unique key
-                )
+def download_search_log(fmt="xlsx", dates=None):
+    # The file is built from the search log database only when requested, and reused until something new is searched
+    search_log_data = export_search_log(fmt, *_date_range(dates))
+    if search_log_data:
+        st.download_button(
+            label="Download Search Log",
+            data=search_log_data,
+            file_name=export_file_name("search_log", fmt, dates),
+            mime=EXPORT_FORMATS[fmt][1],
+            key="download_search_log"  # Unique key
+        )
     else:
         st.write("No search log data available to download.")
 
@@ -60,118 +68,81 @@ def authenticate(username, password):
     return username == ADMIN_USERNAME and password == ADMIN_PASSWORD
 
 
-def save_uploaded_file(uploaded_file):
-    # Delete all existing files in the directory before saving the new one
-    for file in list_files():
-        delete_uploaded_file(file)
-
+def save_uploaded_file(uploaded_file, replace_existing=True):
     # Get the current date in 'DD-MM-YYYY' format
     current_date = datetime.now().strftime("%d-%m-%Y")
 
-    # Rename the file to 'CANTEEN_STOCK_SUMMARY_<current_date>.xlsx'
-    new_file_name = f"CANTEEN_STOCK_SUMMARY_{current_date}.xlsx"
+    if replace_existing:
+        # Rename the file to 'CANTEEN_STOCK_SUMMARY_<current_date>.xlsx'
+        new_file_name = f"CANTEEN_STOCK_SUMMARY_{current_date}.xlsx"
+    else:
+        # A file added next to the others (another depot or category) keeps its own name, which is shown as its source
+        new_file_name = f"{remove_extension(os.path.basename(uploaded_file.name))}.xlsx"
     file_path = os.path.join(UPLOAD_DIR, new_file_name)
 
-    # Save the file with the new name
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # The new file is processed in the background and replaces the existing files only
+    # once it is ready, so other sessions keep seeing the current stock meanwhile
+    replaced = [os.path.join(UPLOAD_DIR, file) for file in list_files()] if replace_existing else []
+    job = stage_upload(uploaded_file.getvalue(), file_path, replaced)
+
+    progress_bar = st.sidebar.progress(0, text="Reading workbook...")
+    while not job.done():
+        if job.total_rows:
+            progress_bar.progress(min(job.rows_read / job.total_rows, 1.0), text=f"Read {job.rows_read} of {job.total_rows} rows")
+        time.sleep(0.2)
+    progress_bar.empty()
 
+    if job.error is not None:
+        st.sidebar.error(f"Error loading file {uploaded_file.name}: {job.error}")
+        return None
+    if job.warning is not None:
+        st.sidebar.warning(job.warning)
     return file_path
 
 
 def delete_uploaded_file(file_name):
-    file_path = os.path.join(UPLOAD_DIR, file_name)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    error = delete_stock_file(os.path.join(UPLOAD_DIR, file_name))
+    if error is not None:
+        st.sidebar.warning(f"File deleted, but the stock history was not updated: {error}")
 
 
 def list_files():
     return os.listdir(UPLOAD_DIR)
 
 
-def load_data(file):
-    try:
-        if file.endswith('.xlsx'):
-            data = pd.read_excel(file, engine='openpyxl')
-        elif file.endswith('.xls'):
-            data = pd.read_excel(file, engine='xlrd')
-        else:
-            st.error(f"Unsupported file format: {file}")
-            return None
-    except Exception as e:
-        st.error(f"Error loading file {os.path.basename(file)}: {e}")
-        return None
-    return data
-
-
-def process_data(data):
-    required_columns = ['Index No', 'Item Description', 'RRATE', 'Closing']
-
-    # Check for missing required columns
-    if not all(col in data.columns for col in required_columns):
-        st.error("Missing required columns in data.")
-        return pd.DataFrame()  # Return empty DataFrame
-
-    # Define a function to check for special characters
-    def has_special_characters(value):
-        if isinstance(value, str):
-            return bool(re.search(r'[^\w\s]', value))  # Check for special characters
-        return False
-
-    # Remove rows with None or special characters in 'Index No'
-    data = data.dropna(subset=required_columns)  # Drop rows with NaN values in required columns
-    data = data[~data['Index No'].apply(has_special_characters)]  # Remove rows with special characters in 'Index No'
-
-    # Remove rows where 'Item Description' contains more than one consecutive '-'
-    data = data[~data['Item Description'].str.contains(r'-{2,}', na=False)]  # Exclude descriptions with more than one hyphen
-
-    # Remove rows where 'Item Description' is NaN
-    data = data.dropna(subset=['Item Description'])  # Remove rows where 'Item Description' is NaN
-
-    # Define a function to safely convert and format 'RRATE'
-    def format_price(value):
-        try:
-            if pd.notnull(value) and value != 0:
-                return f"{float(value):.2f}"  # Convert to float and format
-            else:
-                return 'Soon Available'
-        except ValueError:
-            return 'Soon Available'
-
-    # Apply the format function to 'RRATE'
-    data['Price'] = data['RRATE'].apply(format_price)
-
-    # Determine availability based on 'Closing'
-    data['Available'] = data['Closing'].apply(lambda x: 'YES' if pd.notnull(x) and x != 0 else 'SOON AVAILABLE')
+# Most rows render_table sends to the browser; longer tables are shown a page at a time
+TABLE_ROWS = 100
 
-    # Select only the required columns
-    data = data[['Index No', 'Item Description', 'Price', 'Available']]
+# Rows per page of render_paged_table
+REPORT_PAGE_SIZE = 50
 
-    # Reset index and adjust index to start from 1
-    data.reset_index(drop=True, inplace=True)
-    data.index += 1
-    data.index.name = 'S.No'
-    data.reset_index(inplace=True)
 
-    return data
+# Function to show a table; the banded rows come from the .stock-table CSS
+def render_table(data):
+    if len(data) > TABLE_ROWS:
+        st.caption(f"Showing the first {TABLE_ROWS} of {len(data)} rows")
+        data = data.head(TABLE_ROWS)
+    st.markdown(table_html(data), unsafe_allow_html=True)
 
 
-
-def search_data(data, search_term):
-    if search_term:
-        pattern = f"{search_term}"
-        return data[data['Item Description'].str.contains(pattern, case=False, na=False, regex=True)]
-    return data
-
-
-def color_banded_rows(row):
-    return [
-        'background-color: #f9f5e3; color: #333333' if row.name % 2 == 0 else 'background-color: #ffffff; color: #333333'] * len(
-        row)
+# Function to show a table of any length one page at a time
+def render_paged_table(data, key):
+    total = len(data)
+    pages = max(-(-total // REPORT_PAGE_SIZE), 1)  # Round up
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    first = (page - 1) * REPORT_PAGE_SIZE
+    rows = data.iloc[first:first + REPORT_PAGE_SIZE]
+    if pages > 1:
+        st.caption(f"Showing {first + 1}-{first + len(rows)} of {total} rows (page {page} of {pages})")
+    render_table(rows)
 
 #save Demand datast
 
 
+@st.fragment
+@timed()
 def render_demand_form():
     st.markdown("""
         <style>
@@ -253,7 +224,12 @@ def render_demand_form():
                     "Address": [address]
                 })
 
-                save_demand_data(data)
+                if save_demand_data(data):
+                    # Link the demand to the stock item it asks for while the form is still open
+                    match_new_demands(get_merged_catalog(UPLOAD_DIR))
+                    st.success("Your demand has been submitted.")
+                else:
+                    st.info("This demand has already been submitted today.")
 
 
 # Application Logic
@@ -301,11 +277,42 @@ st.markdown(f"""
             border-radius: 5px;
             border: 2px solid #ff5722;
         }}
-        .stDataFrame>div {{
-            background-color: #ffffff;
+        .stock-table-wrapper {{
+            overflow-x: auto; /* Scroll sideways on narrow screens */
             border: 2px solid #ff5722;
             border-radius: 10px;
-            color: #333333; /* Ensure text color is dark gray */
+            margin-bottom: 1rem;
+        }}
+        .stock-table {{
+            width: 100%;
+            border-collapse: collapse;
+            color: #333333;
+        }}
+        .stock-table th {{
+            background-color: #4caf50;
+            color: white;
+            text-align: left;
+            padding: 6px 10px;
+        }}
+        .stock-table td {{
+            padding: 6px 10px;
+        }}
+        .stock-table tbody tr:nth-child(odd) {{
+            background-color: #f9f5e3; /* Banded rows */
+        }}
+        .stock-table tbody tr:nth-child(even) {{
+            background-color: #ffffff;
+        }}
+        .search-result {{
+            /* Hidden by the browser once its animation-delay has passed */
+            animation: search-result-expire 0s linear forwards;
+        }}
+        @keyframes search-result-expire {{
+            to {{
+                visibility: hidden;
+                height: 0;
+                overflow: hidden;
+            }}
         }}
         @media (prefers-color-scheme: dark) {{
             body {{
@@ -326,128 +333,27 @@ st.markdown(f"""
                 background-color: #333333; /* Dark input background */
                 color: #f5f5f5; /* Light input text */
             }}
-            .stDataFrame>div {{
-                background-color: #2e2e2e; /* Dark DataFrame background */
-                color: #f5f5f5; /* Light DataFrame text */
-            }}
-            .stDataFrame>div .dataframe-row {{
-                background-color: #333333 !important; /* Darker row background */
-                color: #f5f5f5 !important; /* Light row text */
-            }}
-        }}
-        /* Ensure visibility on small screens */
-        @media only screen and (max-width: 600px) {{
-            .stDataFrame>div {{
-                color: #f5f5f5 !important; /* Ensure light text on mobile in dark mode */
-                background-color: #2e2e2e !important; /* Darker background for visibility */
-            }}
-            .stDataFrame>div .dataframe-row {{
-                color: #f5f5f5 !important; /* Ensure light text on mobile in dark mode */
-                background-color: #333333 !important; /* Darker row background */
-            }}
         }}
     </style>
 """, unsafe_allow_html=True)
-# Function to convert image to Base64
-def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-    return encoded_string
-
-# Function to convert image to Base64
-def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-    return encoded_string
-
-# Function to convert image to Base64
-def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-    return encoded_string
-
-# Function to convert image to Base64
-def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-    return encoded_string
-
 # Path to your logo images
-logo_path1 = "logos/paraLogo.png"
-logo_path2 = "logos/BalidanBadge.png"
-
-# Convert the logos to Base64
-logo_base64 = image_to_base64(logo_path1)
-logo_base65 = image_to_base64(logo_path2)
+logo_path1, logo_path2 = HEADER_LOGOS
 
-# Use the Base64 strings in your HTML
-st.markdown(f"""
-    <div class="header-container" style="display: flex; justify-content: space-between; align-items: center; background-color: #4CAF50; padding: 20px; border-radius: 8px;">
-        <!-- Left logo -->
-        <div style="flex: 1; display: flex; justify-content: flex-start; align-items: center;">
-            <img src="data:image/png;base64,{logo_base64}" alt="Left Logo" style="width:100px;"/>  <!-- Adjusted width -->
-        </div>
-        <!-- Title and Subtitle -->
-        <div style="flex: 2; text-align: center;">
-            <div class="header-title" style="font-size: 28px; color: white;"><b>UNIT RUN CANTEEN</b></div>
-            <div class="header-subtitle" style="font-size: 18px; color: white;"><b>THE PARACHUTE REGIMENT TRAINING CENTRE</b></div>
-        </div>
-        <!-- Right logo -->
-        <div style="flex: 1; display: flex; justify-content: flex-end; align-items: center;">
-            <img src="data:image/png;base64,{logo_base65}" alt="Right Logo" style="width:80px;"/>  <!-- Adjusted width -->
-        </div>
-    </div>
-""", unsafe_allow_html=True)
+# The header is built once per process with the logos resized to their displayed width
+st.markdown(header_html(logo_path1, logo_path2), unsafe_allow_html=True)
 #image marquee
-import streamlit as st
-import os
-import base64
-
-
-# Function to convert image to base64 string
-def image_to_base64(image_path):
-    with open(image_path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
-
 
 # Define the path to the images folder
-image_folder = 'img'
+image_folder = MARQUEE_FOLDER
 
-# Get a list of image files in the folder
-image_files = [f for f in os.listdir(image_folder) if f.endswith(('jpg', 'jpeg', 'png', 'gif'))]
+# The marquee is built once per process and rebuilt only when the images change
+marquee = marquee_html(image_folder)
 
 # Check if any images were found
-if not image_files:
+if not marquee:
     st.write("No images found in the folder.")
 else:
-    # Create a marquee element for the images with increased spacing
-    images_html = ''.join(
-        f'<img src="data:image/jpeg;base64,{image_to_base64(os.path.join(image_folder, image))}" style="margin: 0 40px; width: 100px;">'
-        # Increased margin
-        for image in image_files
-    )
-
-    # Duplicate the images to ensure a continuous loop
-    continuous_images_html = images_html * 3  # Adjust the multiplier as needed
-
-    # Add the marquee HTML
-    st.markdown(
-        f"""
-        <style>
-            .marquee {{
-                overflow: hidden;
-                white-space: nowrap;
-                box-sizing: border-box;
-            }}
-        </style>
-        <div class="marquee">
-            <marquee behavior="scroll" direction="left" scrollamount="5">
-                {continuous_images_html}
-            </marquee>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(marquee, unsafe_allow_html=True)
 
 #image marquee ends
 # Initialize session state for page navigation
@@ -465,77 +371,66 @@ with col2:
 
 
 # drop down---start
-UPLOAD_FOLDER = 'uploaded_files'
+# Seconds a selected item's result stays on screen
+RESULT_SECONDS = 10
 
-# Function to get the latest Excel file from the folder
-def get_latest_file(directory):
-    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.xlsx')]
-    if not files:
-        return None
-    latest_file = max(files, key=os.path.getctime)
-    return latest_file
-
-# Function to get items based on item description (without filtering on 'CLOSING')
-def get_items(file_path):
-    df = pd.read_excel(file_path)
-
-    # Ensure the necessary column is present
-    if 'Item Description' in df.columns:
-        # Remove rows with NaN or multiple consecutive hyphens in 'Item Description'
-        df = df.dropna(subset=['Item Description'])  # Remove rows where 'Item Description' is NaN
-        df = df[~df['Item Description'].str.contains(r'-{2,}', na=False)]  # Exclude rows with more than one consecutive hyphen
-
-        # Convert 'Item Description' column to a list
-        item_list = df['Item Description'].tolist()
-        return item_list
-    else:
-        return []
 
 # Function to render the search box with dropdown options
+# Each page region below is a fragment: its own widgets rerun only that region, not the whole script
+@st.fragment
+@timed()
 def render_search_box():
-    # Get the latest file
-    latest_file = get_latest_file(UPLOAD_FOLDER)
-
-    if latest_file:
-        # Get the items from the latest file
-        item_descriptions = get_items(latest_file)
-
-        if item_descriptions:
+    # One catalog over every uploaded file, so items in any of them can be found
+    catalog = get_merged_catalog(UPLOAD_DIR)
+
+    if catalog is not None:
+        if catalog.items:
+            # Only the completions for what has been typed are sent to the browser, not the whole item list
+            typed_prefix = st.text_input("Search Item", placeholder="Type the first letters of an item")
+            item_descriptions = complete_items(catalog, typed_prefix)
+            if typed_prefix and not item_descriptions:
+                st.write("No items start with that.")
             item_descriptions.insert(0, '')  # Add an empty option for default selection
             # Dropdown (Selectbox) options
-            selected_option = st.selectbox("Search Item", item_descriptions)
+            selected_option = st.selectbox("Matching items", item_descriptions)
+
+            # Free-text search that tolerates spelling mistakes
+            typed_query = st.text_input("Can't find it? Type the item name")
+            if typed_query:
+                matches = fuzzy_search_catalog(catalog, typed_query, search_popularity())
+                if not matches.empty:
+                    render_table(matches)
+                else:
+                    st.write("No matching items found.")
+
+            if not selected_option:
+                # Cleared, e.g. by typing another prefix: picking the same item again is a new selection
+                st.session_state.pop('selected_option', None)
 
             # Only show the data if an option is selected
             if selected_option:
                 # Store the timestamp when the item is selected
-                if 'show_data' not in st.session_state or st.session_state.selected_option != selected_option:
+                new_selection = st.session_state.get('selected_option') != selected_option
+                if new_selection:
                     st.session_state.selected_option = selected_option
-                    st.session_state.show_data = True
                     st.session_state.show_time = time.time()
 
-                # Check if the time passed is less than 10 seconds
-                if st.session_state.show_data and time.time() - st.session_state.show_time < 10:
-                    st.write(f'You selected: {selected_option}')
-                    log_search(selected_option)
-
-                    # Load data from the latest file
-                    data1 = load_data(latest_file)
-
-                    if data1 is not None:
-                        # Process and display data according to the selected item
-                        filtered_data = search_data(data1, selected_option)
-                        processed_data = process_data(filtered_data)
-
-                        if not processed_data.empty:
-                            styled_data = processed_data.style.apply(color_banded_rows, axis=1)
-                            st.dataframe(styled_data, use_container_width=True, hide_index=True)
-                        else:
-                            st.write("Available Soon")
-                    else:
-                        st.write("Data not found.")
-                else:
-                    st.session_state.show_data = False  # Hide data after 10 seconds
-                    st.experimental_rerun()  # Refresh to hide the data
+                # The browser hides the result when its time is up, so expiry needs no rerun;
+                # a rerun after that simply leaves it out
+                if time.time() - st.session_state.show_time < RESULT_SECONDS:
+                    # Display the processed rows matching the selected item
+                    processed_data = search_catalog(catalog, selected_option)
+                    if new_selection:
+                        # Log each new selection once per session, with whether it was in stock for the trends;
+                        # reruns while it is shown are not counted again
+                        log_search_async(selected_option, available=bool((processed_data['Available'] == 'YES').any()))
+                    result = table_html(processed_data) if not processed_data.empty else "<p>Available Soon</p>"
+                    st.markdown(
+                        # The markup stays identical across reruns so the browser's timer is not restarted
+                        f'<div class="search-result" style="animation-delay: {RESULT_SECONDS}s">'
+                        f'<p>You selected: {html.escape(selected_option)}</p>{result}</div>',
+                        unsafe_allow_html=True,
+                    )
         else:
             st.write("Stock will update soon.")
     else:
@@ -543,6 +438,200 @@ def render_search_box():
 
 #--------drop down end-------
 
+# Rows per page offered for the stock tables
+PAGE_SIZES = [25, 50, 100]
+
+
+# Function to show one page of a stock table; only the visible rows are sent to the browser
+@st.fragment
+@timed()
+def render_stock_table(file, catalog):
+    total = len(catalog.processed)
+    if total == 0:
+        st.write("No items available.")
+        return
+
+    sort_col, order_col, size_col, page_col = st.columns([2, 1, 1, 1])
+    with sort_col:
+        sort_by = st.selectbox("Sort by", list(catalog.processed.columns), key=f"sort_{file}")
+    with order_col:
+        ascending = st.radio("Order", ["Ascending", "Descending"], key=f"order_{file}") == "Ascending"
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"page_size_{file}")
+    pages = -(-total // page_size)  # Round up
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"page_{file}")
+
+    rows, total = page_rows(catalog, page, page_size, sort_by, ascending)
+    first = (min(page, pages) - 1) * page_size + 1
+    st.caption(f"Showing {first}-{first + len(rows) - 1} of {total} items (page {min(page, pages)} of {pages})")
+    render_table(rows)
+
+
+# Function to show what changed between stock uploads, read from the stored versions
+def render_stock_changes():
+    versions = list_versions()
+    if not versions:
+        st.write("No stock uploads recorded yet.")
+        return
+    period = st.radio("Show changes", ["Since last upload", "Since yesterday"], horizontal=True, key="changes_period")
+    if period == "Since last upload":
+        delta = last_delta()
+    else:
+        delta = changes_since(datetime.now() - timedelta(days=1))
+    if delta.empty:
+        st.write("No changes.")
+        return
+    counts = delta['Change'].value_counts()
+    st.caption(", ".join(f"{change}: {count}" for change, count in counts.items()))
+    render_paged_table(delta, "changes")
+
+# Startup measurements shown in the performance panel, in this order
+STARTUP_LABELS = {
+    "warmup_imports": "Warmup: imports",
+    "warmup_catalog": "Warmup: catalog",
+    "warmup_assets": "Warmup: header and marquee",
+    "warmup": "Warmup: total",
+    "script_imports": "First run: script imports",
+    "first_render": "First run: whole script",
+    "to_first_render": "Server start to first render (serve.py only)",
+}
+
+
+# Function to show per-stage timings; recording is process-wide and off by default
+def render_performance_panel():
+    startup = startup_timings()
+    if startup:
+        st.write("Startup")
+        render_table(pd.DataFrame(
+            [(label, round(startup[name], 3)) for name, label in STARTUP_LABELS.items() if name in startup],
+            columns=["Measurement", "Seconds"],
+        ))
+    recording = st.checkbox("Record stage timings", value=timings_enabled(), key="record_timings")
+    if recording != timings_enabled():
+        enable_timings(recording)
+    summary = timing_summary()
+    if summary.empty:
+        st.write("No timings recorded yet.")
+        return
+    reruns = summary.loc[summary["Stage"] == "script", "Calls"]
+    st.caption(f"Reruns timed: {int(reruns.iloc[0]) if not reruns.empty else 0}")
+    render_table(summary)
+    timings = export_timings()
+    if timings is not None:
+        st.download_button(
+            label="Download timings",
+            data=timings,
+            file_name="stage_timings.csv",
+            mime="text/csv",
+            key="download_timings"
+        )
+    if st.button("Clear timings"):
+        clear_timings()
+
+# Reporting periods offered in the search trends, in days
+TREND_PERIODS = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}
+
+
+# Function to show the search trends, read from the rollups kept as searches are logged
+def render_search_trends():
+    period = st.radio("Period", list(TREND_PERIODS), index=1, horizontal=True, key="trends_period")
+    days = TREND_PERIODS[period]
+
+    trend = search_trend(days)
+    if trend.empty:
+        st.write("No searches in this period.")
+        return
+    st.write(f"{int(trend['Searches'].sum())} searches")
+    st.bar_chart(trend.set_index("Period"))
+
+    st.write("Most searched")
+    render_table(top_search_terms(days))
+
+    st.write("Searched while not available")
+    missed = unavailable_searches(days)
+    if missed.empty:
+        st.write("Every item searched was available.")
+    else:
+        # Whether the missed items have come into stock since, from the live catalog
+        catalog = get_merged_catalog(UPLOAD_DIR)
+        if catalog is not None and not catalog.processed.empty:
+            processed = catalog.processed
+            in_stock = set(processed.loc[processed['Available'] == 'YES', 'Item Description'])
+            missed['Available Now'] = ['YES' if term in in_stock else 'NO' for term in missed['Search Term']]
+        render_table(missed)
+
+
+# Function to show the admin downloads; the upload and delete controls stay in the sidebar
+@st.fragment
+@timed()
+def render_admin_tools():
+    format_col, dates_col = st.columns(2)
+    with format_col:
+        export_format = st.selectbox("Download format", list(EXPORT_FORMATS), key="export_format")
+    with dates_col:
+        export_dates = None
+        if st.checkbox("Only a date range", key="export_limit"):
+            today = datetime.now().date()
+            picked = st.date_input("Dates", value=(today - timedelta(days=30), today), key="export_dates")
+            if picked:
+                # While the second date is still being picked, export the first day alone
+                export_dates = (picked[0], picked[-1])
+
+    if st.button("Download Search Log"):
+        download_search_log(export_format, export_dates)
+    if st.button("Download_demand_data"):
+        download_demand_data(export_format, export_dates)
+
+
+# Function to show the pending demands that can be met from the live stock
+def render_fulfillable_demands():
+    update_demand_matches(get_merged_catalog(UPLOAD_DIR))
+    fulfillable = fulfillable_demands()
+    if fulfillable.empty:
+        st.write("No pending demands are in stock.")
+        return
+    render_paged_table(fulfillable, "fulfillable")
+
+    # Demands handed over are marked fulfilled and leave the list
+    demand_nos = {
+        f"{row['Demand No']}: {row['Product Name']} for {row['Name']} ({row['Service No.']})": row["Demand No"]
+        for row in fulfillable.to_dict('records')
+    }
+    with st.form("fulfilled_form", clear_on_submit=True):
+        done = st.multiselect("Fulfilled demands", list(demand_nos))
+        if st.form_submit_button("Mark fulfilled") and done:
+            mark_demands_fulfilled([demand_nos[label] for label in done])
+            st.rerun()
+
+
+# Function to show the quantity demanded per product
+def render_demand_totals():
+    totals = demand_totals()
+    if totals.empty:
+        st.write("No demands submitted yet.")
+    else:
+        render_paged_table(totals, "totals")
+
+
+# Reports in the Admin Panel, in this order
+ADMIN_REPORTS = {
+    "Search trends": render_search_trends,
+    "Stock changes": render_stock_changes,
+    "Fulfillable demands": render_fulfillable_demands,
+    "Performance": render_performance_panel,
+    "Demand totals": render_demand_totals,
+}
+
+
+# Function to show one admin report; it is computed only while its toggle is on,
+# and using it reruns only the report, not the page or the other reports
+@st.fragment
+def render_admin_report(title):
+    if st.toggle(title, key=f"report_{title}"):
+        with st.container(border=True):
+            ADMIN_REPORTS[title]()
+
 # Main Application Logic
 if st.session_state.page == "admin":
     if 'logged_in' not in st.session_state:
@@ -562,17 +651,20 @@ if st.session_state.page == "admin":
                 st.sidebar.error("Invalid username or password.")
     else:
         st.sidebar.header("Admin Panel")
-        if st.button("Download Search Log"):
-            download_search_log()
-        if st.button("Download_demand_data"):
-            download_demand_data()
+        render_admin_tools()
+        for title in ADMIN_REPORTS:
+            render_admin_report(title)
         st.sidebar.subheader("Upload File")
         uploaded_file = st.sidebar.file_uploader("Upload your Excel file", type=["xlsx", "xls"])
+        replace_existing = st.sidebar.checkbox("Replace the current stock files", value=True)
 
-        if uploaded_file is not None:
-            file_path = save_uploaded_file(uploaded_file)
-            st.session_state.file_path = file_path
-            st.sidebar.success(f"File uploaded: {uploaded_file.name}")
+        # The uploader keeps its file across reruns; process each upload only once
+        if uploaded_file is not None and st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+            st.session_state.uploaded_file_id = uploaded_file.file_id
+            file_path = save_uploaded_file(uploaded_file, replace_existing)
+            if file_path is not None:
+                st.session_state.file_path = file_path
+                st.sidebar.success(f"File uploaded: {uploaded_file.name}")
 
         st.sidebar.subheader("Delete File")
         files = list_files()
@@ -595,18 +687,15 @@ if st.session_state.page == "admin":
             if files:
                 render_search_box()
 
-                for file in files:
+                # Files without an up-to-date snapshot are parsed in parallel
+                catalogs = get_catalogs([os.path.join(UPLOAD_DIR, file) for file in files])
+                for file, catalog in zip(files, catalogs):
                     st.write(f"### {remove_extension(file)}")  # Display the file name without extension
-                    data = load_data(os.path.join(UPLOAD_DIR, file))
-                    if data is not None:
-                        processed_data = process_data(data)
-                        styled_data = processed_data.style.apply(color_banded_rows, axis=1)
-                        st.dataframe(styled_data, use_container_width=True, hide_index=True)
+                    if catalog is not None:
+                        render_stock_table(file, catalog)
 
             else:
                 st.write("No files available. Please upload a file via the Admin Panel.")
-            processed_data = process_data(load_data(st.session_state.file_path))
-            render_search_box()
 
 elif st.session_state.page == "demand":
     render_demand_form()
@@ -619,13 +708,12 @@ else:
     if files:
         render_search_box()
 
-        for file in files:
+        # Files without an up-to-date snapshot are parsed in parallel
+        catalogs = get_catalogs([os.path.join(UPLOAD_DIR, file) for file in files])
+        for file, catalog in zip(files, catalogs):
             st.write(f"### {remove_extension(file)}")  # Display the file name without extension
-            data = load_data(os.path.join(UPLOAD_DIR, file))
-            if data is not None:
-                processed_data = process_data(data)
-                styled_data = processed_data.style.apply(color_banded_rows, axis=1)
-                st.dataframe(styled_data, use_container_width=True, hide_index=True)
+            if catalog is not None:
+                render_stock_table(file, catalog)
 
     else:
         st.write("No files available. Please upload a file via the Admin Panel.")
@@ -689,3 +777,11 @@ st.markdown("""
 """, unsafe_allow_html=True)
 # Make sure to import Font Awesome in the header or use the existing inclusion
 st.markdown('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">', unsafe_allow_html=True)
+
+# Whole-rerun timing for the performance panel
+if timings_enabled():
+    record_timing("script", time.perf_counter() - script_started)
+# The first run of the process is the first visitor's page view
+record_startup("first_render", time.perf_counter() - script_started)
+if since_process_start() is not None:
+    record_startup("to_first_render", since_process_start())
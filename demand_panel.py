@@ -0,0 +1,411 @@
+import glob
+import hashlib
+import os
+import weakref
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from exports import cached_export, frames_to_bytes
+from sqlite_store import SqliteStore
+from stock_history import list_versions, read_delta
+
+
+# Directory for storing demand data
+DEMAND_DIR = "Demand_stock"
+os.makedirs(DEMAND_DIR, exist_ok=True)
+
+DEMAND_DB = os.path.join(DEMAND_DIR, "demand.db")
+
+# Demands whose best catalog match scores lower than this (0-100) are left unmatched
+MATCH_MIN_SCORE = 80
+
+# Form fields as submitted by render_demand_form, and the database column each is stored in
+DEMAND_COLUMNS = {
+    "Service No.": "service_no",
+    "Name": "name",
+    "Product Name": "product_name",
+    "Quantity": "quantity",
+    "Mobile No.": "mobile_no",
+    "Alternate No.": "alternate_no",
+    "Address": "address",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS demands (
+    id INTEGER PRIMARY KEY,
+    service_no TEXT NOT NULL,
+    name TEXT NOT NULL,
+    product_name TEXT NOT NULL COLLATE NOCASE,
+    quantity INTEGER NOT NULL,
+    mobile_no TEXT NOT NULL,
+    alternate_no TEXT,
+    address TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    submission_key TEXT NOT NULL UNIQUE,
+    -- When the admin marked the demand fulfilled; NULL while it is pending
+    fulfilled_at TEXT
+);
+-- Covers the per-product totals, so they are read from the index alone
+CREATE INDEX IF NOT EXISTS demands_product ON demands (product_name, quantity, submitted_at);
+CREATE INDEX IF NOT EXISTS demands_service_no ON demands (service_no);
+CREATE INDEX IF NOT EXISTS demands_submitted_at ON demands (submitted_at);
+-- Catalog item each demand resolved to; index_no is NULL when nothing matched
+CREATE TABLE IF NOT EXISTS demand_matches (
+    demand_id INTEGER PRIMARY KEY REFERENCES demands (id),
+    index_no TEXT,
+    item_description TEXT,
+    score INTEGER,
+    available INTEGER NOT NULL,
+    matched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS demand_matches_index_no ON demand_matches (index_no);
+CREATE INDEX IF NOT EXISTS demand_matches_available ON demand_matches (available);
+-- Last stock version whose changes were applied to the matches
+CREATE TABLE IF NOT EXISTS match_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# The catalog the matched demands' availability was last checked against. Catalogs
+# are cached per version of the stock files, so a different object means the
+# files changed: uploaded, replaced or deleted.
+_checked_catalog = None
+
+
+def _submission_key(row, submitted_at):
+    # The same person asking for the same product and quantity on the same day is one demand
+    parts = (
+        str(row["service_no"]).strip().upper(),
+        " ".join(str(row["product_name"]).lower().split()),
+        str(int(row["quantity"])),
+        submitted_at[:10],
+    )
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _insert(conn, data, submitted_at=None):
+    # Store the rows of a demand DataFrame, skipping repeated submissions
+    data = data.rename(columns=DEMAND_COLUMNS)
+    rows = []
+    for row in data.to_dict("records"):
+        timestamp = submitted_at or str(row.get("submitted_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        rows.append((
+            str(row["service_no"]).strip(),
+            str(row["name"]).strip(),
+            str(row["product_name"]).strip(),
+            int(row["quantity"]),
+            str(row["mobile_no"]).strip(),
+            str(row.get("alternate_no") or "").strip(),
+            str(row["address"]).strip(),
+            timestamp,
+            _submission_key(row, timestamp),
+        ))
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO demands
+                (service_no, name, product_name, quantity, mobile_no, alternate_no, address, submitted_at, submission_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        return conn.total_changes - before
+
+
+def _import_old_demands(conn):
+    # Import the demand spreadsheets earlier versions wrote into an empty database
+    empty = conn.execute("SELECT COUNT(*) FROM demands").fetchone()[0] == 0
+    if empty:
+        for path in sorted(glob.glob(os.path.join(DEMAND_DIR, "*.xlsx"))):
+            try:
+                old = pd.read_excel(path, engine='openpyxl')
+            except Exception as e:
+                print(f"Error reading demand file {os.path.basename(path)}: {e}")
+                continue
+            required = set(DEMAND_COLUMNS) - {"Alternate No."}
+            if required <= set(old.columns):
+                old = old.dropna(subset=list(required)).fillna({"Alternate No.": ""})
+                submitted_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+                _insert(conn, old, submitted_at)
+
+
+_db = SqliteStore(DEMAND_DB, _SCHEMA, _import_old_demands)
+
+
+def save_demand_data(data):
+    """
+    Saves demands submitted through the demand form.
+
+    A demand repeating one already made by the same service number for the same
+    product and quantity on the same day is not stored again.
+
+    Parameters:
+        data (DataFrame): One row per demand with the DEMAND_COLUMNS fields.
+
+    Returns:
+        int: Number of demands stored; 0 when they were all repeats.
+    """
+    with closing(_db.connect()) as conn:
+        return _insert(conn, data)
+
+
+def get_demands(product_name=None, service_no=None, since=None, until=None):
+    """
+    Returns the stored demands, newest first, optionally filtered.
+
+    Parameters:
+        product_name (str): Only demands for this product (case-insensitive).
+        service_no (str): Only demands made by this service number.
+        since (datetime): Only demands submitted at or after this time.
+        until (datetime): Only demands submitted before this time.
+
+    Returns:
+        DataFrame: The DEMAND_COLUMNS fields plus 'Submitted At'.
+    """
+    conditions, params = [], []
+    if product_name:
+        conditions.append("product_name = ?")
+        params.append(product_name.strip())
+    if service_no:
+        conditions.append("service_no = ?")
+        params.append(service_no.strip())
+    if since is not None:
+        conditions.append("submitted_at >= ?")
+        params.append(since.strftime("%Y-%m-%d %H:%M:%S"))
+    if until is not None:
+        conditions.append("submitted_at < ?")
+        params.append(until.strftime("%Y-%m-%d %H:%M:%S"))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with closing(_db.connect()) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(DEMAND_COLUMNS.values())}, submitted_at FROM demands {where} "
+            "ORDER BY submitted_at DESC, id DESC",
+            params,
+        ).fetchall()
+    return pd.DataFrame(rows, columns=[*DEMAND_COLUMNS, "Submitted At"])
+
+
+def demand_totals(since=None, until=None):
+    """
+    Returns the total quantity demanded per product.
+
+    Product names differing only in case are counted together.
+
+    Parameters:
+        since (datetime): Only count demands submitted at or after this time.
+        until (datetime): Only count demands submitted before this time.
+
+    Returns:
+        DataFrame: 'Product Name', 'Total Quantity', 'Demands' and 'Last Demanded',
+            most demanded first.
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("submitted_at >= ?")
+        params.append(since.strftime("%Y-%m-%d %H:%M:%S"))
+    if until is not None:
+        conditions.append("submitted_at < ?")
+        params.append(until.strftime("%Y-%m-%d %H:%M:%S"))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with closing(_db.connect()) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT MIN(product_name), SUM(quantity), COUNT(*), MAX(submitted_at)
+            FROM demands {where}
+            GROUP BY product_name
+            ORDER BY SUM(quantity) DESC, MIN(product_name)
+            """,
+            params,
+        ).fetchall()
+    return pd.DataFrame(rows, columns=["Product Name", "Total Quantity", "Demands", "Last Demanded"])
+
+
+def export_demand_data(fmt="xlsx", since=None, until=None):
+    """
+    Builds the demand file on demand, once per version of the demand data.
+
+    Demands are only ever added, so the newest id identifies the data; asking
+    again before a new demand arrives returns the file built the first time.
+
+    Parameters:
+        fmt (str): Key of exports.EXPORT_FORMATS. xlsx also has a 'Totals' sheet;
+            CSV and Parquet hold the demands only.
+        since (datetime): Only demands submitted at or after this time.
+        until (datetime): Only demands submitted before this time.
+
+    Returns:
+        bytes or None: The file contents, or None when there are no demands in the period.
+    """
+    with closing(_db.connect()) as conn:
+        version = conn.execute("SELECT MAX(id) FROM demands").fetchone()[0]
+
+    def build():
+        demands = get_demands(since=since, until=until)
+        if demands.empty:
+            return None
+        sheets = {'Demands': demands}
+        if fmt == "xlsx":
+            sheets['Totals'] = demand_totals(since, until)
+        return frames_to_bytes(sheets, fmt)
+
+    return cached_export(("demand_data", version, fmt, since, until), build)
+
+
+def _match_product(catalog, product_name):
+    # Best catalog item for a demanded product, looked up in the catalog's search index
+    matches = catalog.index.fuzzy_search(product_name, limit=1, min_score=MATCH_MIN_SCORE)
+    if not matches:
+        return None, None, None, 0
+    position, score = matches[0]
+    item = catalog.processed.iloc[position]
+    return str(item['Index No']), str(item['Item Description']), score, int(item['Available'] == 'YES')
+
+
+def _match_demands(conn, catalog, condition):
+    # Match the demands selected by an SQL condition on demands d / demand_matches m
+    demands = conn.execute(
+        "SELECT d.id, d.product_name FROM demands d "
+        f"LEFT JOIN demand_matches m ON m.demand_id = d.id WHERE {condition}"
+    ).fetchall()
+    matched_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Demands for the same product share one lookup
+    lookups = {}
+    rows = []
+    for demand_id, product_name in demands:
+        key = " ".join(product_name.lower().split())
+        if key not in lookups:
+            lookups[key] = _match_product(catalog, product_name)
+        rows.append((demand_id, *lookups[key], matched_at))
+    with conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO demand_matches (demand_id, index_no, item_description, score, available, matched_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    return len(rows)
+
+
+def _refresh_availability(conn, catalog, index_nos):
+    # Re-read the availability of the given items from the catalog for the demands matched to them
+    # An item listed in several stock files is available if any of them has it
+    processed = catalog.processed
+    current = processed[processed['Index No'].isin(index_nos)]
+    available = set(current.loc[current['Available'] == 'YES', 'Index No'])
+    updates = [(int(index_no in available), index_no) for index_no in index_nos]
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "UPDATE demand_matches SET available = ?1 WHERE index_no = ?2 AND available != ?1",
+            updates,
+        )
+        return conn.total_changes - before
+
+
+def match_new_demands(catalog):
+    """
+    Matches the demands not matched yet to items of the live catalog.
+
+    Parameters:
+        catalog (Catalog): The live stock catalog, or None when there is none.
+
+    Returns:
+        int: Number of demands matched.
+    """
+    if catalog is None:
+        return 0
+    with closing(_db.connect()) as conn:
+        return _match_demands(conn, catalog, "m.demand_id IS NULL")
+
+
+def update_demand_matches(catalog):
+    """
+    Brings the demand matches up to date with the live catalog.
+
+    New demands are matched. Whenever the live catalog changes, the
+    availability of every matched demand is checked again. Unmatched demands
+    are retried when the stock history shows an upload added items.
+
+    Parameters:
+        catalog (Catalog): The live stock catalog, or None when there is none.
+
+    Returns:
+        int: Number of demands matched or updated.
+    """
+    global _checked_catalog
+    if catalog is None:
+        return 0
+    versions = [v['version'] for v in list_versions()]
+    with closing(_db.connect()) as conn:
+        state = conn.execute("SELECT value FROM match_state WHERE key = 'stock_version'").fetchone()
+        applied = state[0] if state else None
+        updated = 0
+        if _checked_catalog is None or _checked_catalog() is not catalog:
+            matched = {row[0] for row in conn.execute("SELECT DISTINCT index_no FROM demand_matches WHERE index_no IS NOT NULL")}
+            updated += _refresh_availability(conn, catalog, matched)
+            _checked_catalog = weakref.ref(catalog)
+        if versions and applied != versions[-1]:
+            if applied in versions:
+                deltas = [read_delta(version) for version in versions[versions.index(applied) + 1:]]
+                if any((delta['Change'] == 'new').any() for delta in deltas):
+                    updated += _match_demands(conn, catalog, "m.index_no IS NULL")
+            else:
+                # No recorded starting point: match every demand against the live catalog
+                updated += _match_demands(conn, catalog, "1")
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO match_state (key, value) VALUES ('stock_version', ?)",
+                    (versions[-1],),
+                )
+        updated += _match_demands(conn, catalog, "m.demand_id IS NULL")
+    return updated
+
+
+def fulfillable_demands():
+    """
+    Returns the pending demands whose matched item is available now, oldest first.
+
+    Returns:
+        DataFrame: The demand number, the demand, the matched catalog item and when it was submitted.
+    """
+    with closing(_db.connect()) as conn:
+        rows = conn.execute(
+            """
+            SELECT d.id, d.service_no, d.name, d.product_name, d.quantity, d.mobile_no,
+                   m.item_description, m.index_no, d.submitted_at
+            FROM demand_matches m JOIN demands d ON d.id = m.demand_id
+            WHERE m.available = 1 AND d.fulfilled_at IS NULL
+            ORDER BY d.submitted_at, d.id
+            """
+        ).fetchall()
+    return pd.DataFrame(rows, columns=[
+        "Demand No", "Service No.", "Name", "Product Name", "Quantity", "Mobile No.", "Matched Item", "Index No", "Submitted At",
+    ])
+
+
+def mark_demands_fulfilled(demand_ids):
+    """
+    Marks demands as fulfilled, so they leave the list of fulfillable demands.
+
+    Parameters:
+        demand_ids (list): 'Demand No' values from fulfillable_demands.
+
+    Returns:
+        int: Number of demands marked; those already fulfilled are not counted.
+    """
+    fulfilled_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with closing(_db.connect()) as conn:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE demands SET fulfilled_at = ? WHERE id = ? AND fulfilled_at IS NULL",
+                [(fulfilled_at, int(demand_id)) for demand_id in demand_ids],
+            )
+            return conn.total_changes - before
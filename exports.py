@@ -0,0 +1,81 @@
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# Download formats: file extension and MIME type
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# Number of built exports kept in memory across all sessions
+EXPORT_CACHE_SIZE = 8
+
+# Built exports keyed on (name, data version, format, date range)
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+
+
+def frames_to_bytes(sheets, fmt):
+    """
+    Writes tables to a file in one of the EXPORT_FORMATS.
+
+    Parameters:
+        sheets (dict): {sheet name: DataFrame}; xlsx gets one sheet each, while
+            CSV and Parquet hold only the first table.
+        fmt (str): Key of EXPORT_FORMATS.
+
+    Returns:
+        bytes: The file contents.
+    """
+    buffer = io.BytesIO()
+    if fmt == "xlsx":
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            for name, frame in sheets.items():
+                frame.to_excel(writer, index=False, sheet_name=name)
+    elif fmt == "CSV":
+        next(iter(sheets.values())).to_csv(buffer, index=False, encoding='utf-8')
+    elif fmt == "Parquet":
+        next(iter(sheets.values())).to_parquet(buffer, index=False)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return buffer.getvalue()
+
+
+def cached_export(key, build):
+    """
+    Returns an export built once per key, building it on first request.
+
+    The key includes the version of the data, so a change to the data gives a
+    new key and the stale export is simply never asked for again.
+
+    Parameters:
+        key (tuple): (name, data version, format, date range ...).
+        build (callable): Returns the export contents, or None when there is nothing to export.
+
+    Returns:
+        bytes or None: What build returned.
+    """
+    with _export_lock:
+        if key in _export_cache:
+            _export_cache.move_to_end(key)
+            return _export_cache[key]
+    data = build()
+    with _export_lock:
+        _export_cache[key] = data
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return data
+
+
+def export_file_name(name, fmt, dates=None):
+    # e.g. search_log.xlsx, or demand_data_2026-01-01_2026-01-31.csv for a date range
+    extension = EXPORT_FORMATS[fmt][0]
+    if dates is None:
+        return f"{name}.{extension}"
+    first, last = dates
+    return f"{name}_{first:%Y-%m-%d}_{last:%Y-%m-%d}.{extension}"
@@ -0,0 +1,238 @@
+import bisect
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from fuzzywuzzy import fuzz
+
+
+# Length of the character n-grams stored in the index
+GRAM_SIZE = 3
+
+# Number of descriptions most similar by n-grams that get a full fuzzy score
+CANDIDATE_POOL = 40
+
+# Fuzzy matches scoring below this (0-100) are not shown
+FUZZY_MIN_SCORE = 60
+
+# Most points a frequently searched description can gain over a rarely searched one
+POPULARITY_WEIGHT = 10
+
+
+def normalize(text):
+    # Searches ignore case, like str.contains(case=False) did
+    return str(text).lower()
+
+
+def grams(word):
+    return {word[i:i + GRAM_SIZE] for i in range(len(word) - GRAM_SIZE + 1)}
+
+
+class SearchIndex:
+    """
+    Inverted n-gram index over item descriptions.
+
+    Every word of every description is split into overlapping n-grams, and each
+    n-gram maps to the set of row positions containing it. A query is answered by
+    intersecting the posting sets of its own n-grams and then confirming the few
+    remaining candidates with a literal substring test, so characters such as
+    '(', '+' or '.' have no special meaning.
+    """
+
+    def __init__(self, descriptions, previous=None):
+        self.texts = [normalize(text) for text in descriptions]
+        self.postings = defaultdict(set)
+        # Number of distinct n-grams per description, used to rank fuzzy candidates
+        self.gram_counts = []
+        # N-grams of each description; a new upload only splits descriptions that changed
+        self.text_grams = {}
+        # A merged catalog reuses the n-grams of every per-file index it is built from
+        known_grams = {}
+        for index in ([previous] if isinstance(previous, SearchIndex) else previous or []):
+            known_grams.update(index.text_grams)
+        for position, text in enumerate(self.texts):
+            text_grams = self.text_grams.get(text)
+            if text_grams is None:
+                text_grams = known_grams.get(text)
+                if text_grams is None:
+                    text_grams = frozenset().union(*(grams(word) for word in text.split()))
+                self.text_grams[text] = text_grams
+            for gram in text_grams:
+                self.postings[gram].add(position)
+            self.gram_counts.append(len(text_grams))
+        self.postings = dict(self.postings)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def candidates(self, words):
+        """
+        Returns the row positions that contain every n-gram of the given words.
+
+        Parameters:
+            words (list): Normalized query words.
+
+        Returns:
+            set or None: None when the words are too short to narrow the search.
+        """
+        query_grams = set().union(*(grams(word) for word in words)) if words else set()
+        if not query_grams:
+            return None
+        posting_sets = []
+        for gram in query_grams:
+            postings = self.postings.get(gram)
+            if not postings:
+                return set()
+            posting_sets.append(postings)
+        # Intersect starting from the rarest n-gram to keep intermediate sets small
+        posting_sets.sort(key=len)
+        result = set(posting_sets[0])
+        for postings in posting_sets[1:]:
+            result &= postings
+            if not result:
+                break
+        return result
+
+    def search(self, query, all_words=False):
+        """
+        Finds the descriptions matching a query.
+
+        Parameters:
+            query (str): Text typed or selected by the user.
+            all_words (bool): Match each word anywhere in the description instead
+                of the whole query as one substring.
+
+        Returns:
+            list: Matching row positions in catalog order.
+        """
+        query = normalize(query)
+        if not query:
+            return list(range(len(self.texts)))
+        words = query.split()
+
+        found = self.candidates(words)
+        if found is None:
+            found = range(len(self.texts))
+        if all_words:
+            return sorted(i for i in found if all(word in self.texts[i] for word in words))
+        return sorted(i for i in found if query in self.texts[i])
+
+    def fuzzy_search(self, query, limit=10, popularity=None, min_score=FUZZY_MIN_SCORE):
+        """
+        Finds the descriptions closest to a query that may contain spelling mistakes.
+
+        Descriptions sharing the most n-grams with the query are shortlisted from
+        the index, and only those are scored with fuzzywuzzy.
+
+        Parameters:
+            query (str): Free text typed by the user.
+            limit (int): Maximum number of matches to return.
+            popularity (Popularity or dict): Optional search counts, as a
+                Popularity or {search term: count}, used to rank frequently
+                searched items higher among similar matches.
+            min_score (int): Matches scoring lower than this are dropped.
+
+        Returns:
+            list: (row position, score) pairs, best match first.
+        """
+        query = normalize(query).strip()
+        if not query:
+            return []
+        query_grams = set().union(*(grams(word) for word in query.split()))
+        if not query_grams:
+            # Too short to be fuzzy about; fall back to the literal search
+            return [(position, 100) for position in self.search(query)[:limit]]
+
+        overlap = Counter()
+        for gram in query_grams:
+            overlap.update(self.postings.get(gram, ()))
+        # Rank by n-gram similarity (Dice coefficient) so long descriptions are not favoured
+        similarity = {
+            position: 2 * shared / (len(query_grams) + self.gram_counts[position])
+            for position, shared in overlap.items()
+        }
+        shortlist = heapq.nlargest(CANDIDATE_POOL, similarity, key=similarity.get)
+
+        if isinstance(popularity, dict):
+            popularity = Popularity(popularity)
+
+        scored = []
+        for position in shortlist:
+            score = fuzz.WRatio(query, self.texts[position])
+            if score >= min_score:
+                # Only the shortlisted descriptions are looked up
+                if popularity is not None:
+                    score += popularity.bonus(self.texts[position])
+                scored.append((position, score))
+        scored.sort(key=lambda match: (-match[1], match[0]))
+        return [(position, round(score)) for position, score in scored[:limit]]
+
+
+class Popularity:
+    """
+    How often each description has been searched, as the bonus fuzzy_search adds to its score.
+
+    Built once per version of the search log and shared between queries, so a
+    query only looks up the descriptions it shortlisted.
+    """
+
+    def __init__(self, counts):
+        self.counts = {normalize(term): count for term, count in counts.items() if count > 0}
+        self.top_count = max(self.counts.values(), default=0)
+
+    def bonus(self, text):
+        # Up to POPULARITY_WEIGHT points, on a log scale relative to the most searched description
+        count = self.counts.get(text)
+        if not count:
+            return 0
+        return POPULARITY_WEIGHT * math.log1p(count) / math.log1p(self.top_count)
+
+
+class PrefixCompleter:
+    """
+    Sorted-array autocomplete over item descriptions.
+
+    Descriptions starting with the typed text come first, followed by those
+    with a later word starting with it, each group in alphabetical order. Both
+    groups are found by binary search, so a lookup reads only about as many
+    entries as it returns, however large the catalog is.
+    """
+
+    def __init__(self, descriptions):
+        # Distinct descriptions in catalog order; entries below refer to them by position
+        self.descriptions = list(dict.fromkeys(str(text) for text in descriptions))
+        self.starts = []
+        self.word_starts = []
+        for position, text in enumerate(self.descriptions):
+            words = normalize(text).split()
+            self.starts.append((" ".join(words), position))
+            for i in range(1, len(words)):
+                self.word_starts.append((" ".join(words[i:]), position))
+        self.starts.sort()
+        self.word_starts.sort()
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns the descriptions completing what the user has typed.
+
+        Parameters:
+            prefix (str): Text typed so far.
+            limit (int): Maximum number of completions.
+
+        Returns:
+            list: Up to limit descriptions, best first.
+        """
+        prefix = " ".join(normalize(prefix).split())
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        for entries in (self.starts, self.word_starts):
+            i = bisect.bisect_left(entries, (prefix,))
+            while i < len(entries) and len(found) < limit and entries[i][0].startswith(prefix):
+                position = entries[i][1]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(self.descriptions[position])
+                i += 1
+        return found
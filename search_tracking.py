@@ -1,20 +1,146 @@
+import atexit
 import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timedelta
+
 import pandas as pd
-from datetime import datetime
+
+from exports import cached_export, frames_to_bytes
+from search_index import Popularity
+from sqlite_store import SqliteStore
+from stage_timings import timed
 
 
 # Directory for storing search logs
 LOG_DIR = "search_log"
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Spreadsheet written by earlier versions; imported once into the database
 SEARCH_LOG_FILE = os.path.join(LOG_DIR, "search_log.xlsx")
+SEARCH_LOG_DB = os.path.join(LOG_DIR, "search_log.db")
+
+# Background writer: searches waiting to be written, and when a batch is flushed
+QUEUE_SIZE = 10000
+FLUSH_BATCH = 200
+FLUSH_INTERVAL = 2.0  # seconds
+
+# Hourly rollups are kept this many days; daily rollups are kept for good
+HOURLY_DAYS = 14
+
+# Terms listed in the admin trends
+TOP_TERMS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_events (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL,
+    searched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_events_searched_at ON search_events (searched_at);
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT PRIMARY KEY,
+    search_count INTEGER NOT NULL,
+    last_searched TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_terms_count ON search_terms (search_count);
+CREATE TABLE IF NOT EXISTS search_hourly (
+    hour TEXT NOT NULL,
+    term TEXT NOT NULL,
+    search_count INTEGER NOT NULL,
+    PRIMARY KEY (hour, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_daily (
+    day TEXT NOT NULL,
+    term TEXT NOT NULL,
+    search_count INTEGER NOT NULL,
+    -- Searches made while the item was not available
+    unavailable_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, term)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS search_daily_term ON search_daily (term);
+"""
+
+
+def _import_old_log(conn):
+    # Import the spreadsheet earlier versions wrote into an empty database
+    with conn:
+        empty = conn.execute("SELECT COUNT(*) FROM search_terms").fetchone()[0] == 0
+        if empty and os.path.exists(SEARCH_LOG_FILE):
+            search_log = pd.read_excel(SEARCH_LOG_FILE, engine='openpyxl')
+            if {"Search Term", "Timestamp", "Search Count"} <= set(search_log.columns):
+                search_log = search_log.dropna(subset=["Search Term"])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO search_terms (term, search_count, last_searched) VALUES (?, ?, ?)",
+                    [
+                        (str(row["Search Term"]), int(row["Search Count"]), str(row["Timestamp"]))
+                        for _, row in search_log.fillna({"Search Count": 1, "Timestamp": ""}).iterrows()
+                    ],
+                )
+
+
+_db = SqliteStore(SEARCH_LOG_DB, _SCHEMA, _import_old_log)
+
+
+def _record(conn, events):
+    # Append the raw events and fold them into the per-term totals and the rollups in one transaction.
+    # Events are (term, timestamp) or (term, timestamp, available) with available True, False or None.
+    counts = Counter(event[0] for event in events)
+    hourly = Counter((event[1][:13], event[0]) for event in events)
+    daily = Counter((event[1][:10], event[0]) for event in events)
+    unavailable = Counter((event[1][:10], event[0]) for event in events if len(event) > 2 and event[2] is False)
+    last_seen = {}
+    for term, timestamp, *_ in events:
+        last_seen[term] = max(timestamp, last_seen.get(term, timestamp))
+    with conn:
+        conn.executemany("INSERT INTO search_events (term, searched_at) VALUES (?, ?)", [event[:2] for event in events])
+        # Repeated terms in a batch become a single counter update
+        conn.executemany(
+            """
+            INSERT INTO search_terms (term, search_count, last_searched) VALUES (?, ?, ?)
+            ON CONFLICT(term) DO UPDATE SET
+                search_count = search_count + excluded.search_count,
+                last_searched = MAX(last_searched, excluded.last_searched)
+            """,
+            [(term, count, last_seen[term]) for term, count in counts.items()],
+        )
+        conn.executemany(
+            """
+            INSERT INTO search_hourly (hour, term, search_count) VALUES (?, ?, ?)
+            ON CONFLICT(hour, term) DO UPDATE SET search_count = search_count + excluded.search_count
+            """,
+            [(hour, term, count) for (hour, term), count in hourly.items()],
+        )
+        conn.executemany(
+            """
+            INSERT INTO search_daily (day, term, search_count, unavailable_count) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day, term) DO UPDATE SET
+                search_count = search_count + excluded.search_count,
+                unavailable_count = unavailable_count + excluded.unavailable_count
+            """,
+            [(day, term, count, unavailable[(day, term)]) for (day, term), count in daily.items()],
+        )
+        # Old hourly buckets are dropped as new ones arrive; the primary key makes this a range delete
+        cutoff = (datetime.now() - timedelta(days=HOURLY_DAYS)).strftime("%Y-%m-%d %H")
+        conn.execute("DELETE FROM search_hourly WHERE hour < ?", (cutoff,))
+
 
-def log_search(search_term):
+@timed()
+def log_search(search_term, available=None):
     """
     Logs the search term and timestamp, updating the existing entry or adding a new one.
 
+    Each search appends one event and updates one counter row per rollup, so the
+    cost does not grow with the size of the log, and concurrent sessions or
+    processes are safe.
+
     Parameters:
         search_term (str): The search term entered by the user.
+        available (bool): Whether the item was available when searched, or None when not known.
 
     Returns:
         None
@@ -26,35 +152,275 @@ def log_search(search_term):
     # Get the current timestamp
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Create a new entry
-    new_entry = {"Search Term": search_term, "Timestamp": timestamp, "Search Count": 1}
+    with closing(_db.connect()) as conn:
+        _record(conn, [(search_term, timestamp, available)])
 
-    # Check if the search log file exists
-    if os.path.exists(SEARCH_LOG_FILE):
-        # Append the new entry to the existing file
-        with pd.ExcelWriter(SEARCH_LOG_FILE, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-            # Load existing log into a DataFrame
-            search_log = pd.read_excel(SEARCH_LOG_FILE, engine='openpyxl')
-            # Check if 'Search Term' column exists
-            if "Search Term" in search_log.columns:
-                # Check if the search term already exists in the log
-                if search_term in search_log["Search Term"].values:
-                    # Update the count and timestamp for the existing term
-                    search_log.loc[search_log["Search Term"] == search_term, "Search Count"] += 1
-                    search_log.loc[search_log["Search Term"] == search_term, "Timestamp"] = timestamp
-                else:
-                    # Add a new entry to the log
-                    search_log = pd.concat([search_log, pd.DataFrame([new_entry])], ignore_index=True)
-            else:
-                print("Error: 'Search Term' column is missing in the log file.")
-                return
-            # Save the updated log back to the Excel file
-            search_log.to_excel(writer, index=False, sheet_name='Sheet1')
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer_thread = None
+_STOP = object()
+
+
+@timed("log_search_batch")
+def _write_batch(events):
+    try:
+        with closing(_db.connect()) as conn:
+            _record(conn, events)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error writing {len(events)} search log entries: {e}")
+
+
+def _writer_loop():
+    pending = []
+    deadline = None
+    while True:
+        timeout = max(0.0, deadline - time.monotonic()) if pending else None
+        try:
+            item = _queue.get(timeout=timeout)
+        except queue.Empty:
+            item = None  # The flush interval has elapsed
+
+        if isinstance(item, tuple):
+            pending.append(item)
+            if len(pending) == 1:
+                deadline = time.monotonic() + FLUSH_INTERVAL
+            if len(pending) < FLUSH_BATCH and time.monotonic() < deadline:
+                continue
+
+        if pending:
+            _write_batch(pending)
+            pending = []
+        if isinstance(item, threading.Event):
+            item.set()  # Someone is waiting in flush_search_log
+        elif item is _STOP:
+            return
+
+
+def _ensure_writer():
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="search-log-writer", daemon=True)
+            _writer_thread.start()
+
+
+@timed()
+def log_search_async(search_term, available=None):
+    """
+    Queues a search to be logged by the background writer and returns immediately.
+
+    Parameters:
+        search_term (str): The search term entered by the user.
+        available (bool): Whether the item was available when searched, or None when not known.
+
+    Returns:
+        None
+    """
+    if not search_term.strip():  # Check if search term is empty
+        return
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _ensure_writer()
+    try:
+        _queue.put_nowait((search_term, timestamp, available))
+    except queue.Full:
+        print(f"Search log queue is full. Search for '{search_term}' was not recorded.")
+
+
+def flush_search_log(timeout=10):
+    # Wait until every queued search has been written
+    if _writer_thread is None or not _writer_thread.is_alive():
+        return
+    done = threading.Event()
+    _queue.put(done)
+    done.wait(timeout)
+
+
+@atexit.register
+def _stop_writer():
+    # Drain the queue before the interpreter exits
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _queue.put(_STOP)
+        _writer_thread.join(timeout=10)
+
+
+def get_search_log(since=None, until=None):
+    """
+    Returns the aggregated search log.
+
+    Parameters:
+        since (datetime): Only count searches made at or after this time.
+        until (datetime): Only count searches made before this time.
+
+    Returns:
+        DataFrame: 'Search Term', 'Timestamp' (last searched) and 'Search Count' columns.
+    """
+    flush_search_log()
+    with closing(_db.connect()) as conn:
+        if since is None and until is None:
+            rows = conn.execute("SELECT term, last_searched, search_count FROM search_terms ORDER BY rowid").fetchall()
+        else:
+            # A date range is counted from the raw events; searches imported from the old spreadsheet have none
+            rows = conn.execute(
+                "SELECT term, MAX(searched_at), COUNT(*) FROM search_events "
+                "WHERE searched_at >= ? AND searched_at < ? GROUP BY term ORDER BY MIN(id)",
+                (
+                    since.strftime("%Y-%m-%d %H:%M:%S") if since is not None else "",
+                    until.strftime("%Y-%m-%d %H:%M:%S") if until is not None else "9999",
+                ),
+            ).fetchall()
+    return pd.DataFrame(rows, columns=["Search Term", "Timestamp", "Search Count"])
+
+
+def _log_version():
+    # Changes whenever a search is written; the totals only change together with the events
+    flush_search_log()
+    with closing(_db.connect()) as conn:
+        return conn.execute("SELECT MAX(id), (SELECT COUNT(*) FROM search_terms) FROM search_events").fetchone()
+
+
+def export_search_log(fmt="xlsx", since=None, until=None):
+    """
+    Builds the search log file on demand, once per version of the log.
+
+    Asking again for the same format and period before anything new has been
+    searched returns the file built the first time.
+
+    Parameters:
+        fmt (str): Key of exports.EXPORT_FORMATS.
+        since (datetime): Only count searches made at or after this time.
+        until (datetime): Only count searches made before this time.
+
+    Returns:
+        bytes or None: The file contents, or None when nothing was searched in the period.
+    """
+    def build():
+        search_log = get_search_log(since, until)
+        if search_log.empty:
+            return None
+        return frames_to_bytes({'Sheet1': search_log}, fmt)
+
+    return cached_export(("search_log", _log_version(), fmt, since, until), build)
+
+
+def _since(days):
+    # Start of the reporting period, as stored in the rollups
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def search_trend(days=7):
+    """
+    Returns the number of searches per bucket over a recent period, read from the rollups.
+
+    Periods of up to two days are counted per hour, longer ones per day.
+
+    Parameters:
+        days (int): Length of the period, ending now.
+
+    Returns:
+        DataFrame: 'Period' and 'Searches' columns, oldest first.
+    """
+    flush_search_log()
+    if days <= 2:
+        query = "SELECT hour, SUM(search_count) FROM search_hourly WHERE hour >= ? GROUP BY hour ORDER BY hour"
+        since = _since(days)[:13]
     else:
-        # Create a new DataFrame and save it to a new file
-        search_log = pd.DataFrame([new_entry])
-        with pd.ExcelWriter(SEARCH_LOG_FILE, engine='openpyxl') as writer:
-            search_log.to_excel(writer, index=False, sheet_name='Sheet1')
+        query = "SELECT day, SUM(search_count) FROM search_daily WHERE day >= ? GROUP BY day ORDER BY day"
+        since = _since(days)[:10]
+    with closing(_db.connect()) as conn:
+        rows = conn.execute(query, (since,)).fetchall()
+    return pd.DataFrame(rows, columns=["Period", "Searches"])
+
+
+def top_search_terms(days=None, limit=TOP_TERMS):
+    """
+    Returns the most searched terms, from the rollups rather than the raw log.
+
+    Parameters:
+        days (int): Length of the period, ending now, or None for all time.
+        limit (int): Number of terms.
+
+    Returns:
+        DataFrame: 'Search Term', 'Searches' and 'Not Available' (searches made
+            while the item was not available) columns, most searched first.
+    """
+    flush_search_log()
+    with closing(_db.connect()) as conn:
+        if days is None:
+            # All-time totals are already kept per term; the count index gives the top terms directly
+            rows = conn.execute(
+                "SELECT t.term, t.search_count, COALESCE(SUM(d.unavailable_count), 0) "
+                "FROM (SELECT term, search_count FROM search_terms ORDER BY search_count DESC LIMIT ?) t "
+                "LEFT JOIN search_daily d ON d.term = t.term GROUP BY t.term ORDER BY t.search_count DESC",
+                (limit,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT term, SUM(search_count), SUM(unavailable_count) FROM search_daily "
+                "WHERE day >= ? GROUP BY term ORDER BY 2 DESC LIMIT ?",
+                (_since(days)[:10], limit),
+            ).fetchall()
+    return pd.DataFrame(rows, columns=["Search Term", "Searches", "Not Available"])
+
+
+def unavailable_searches(days=7, limit=TOP_TERMS):
+    """
+    Returns the terms most often searched while the item was not available.
+
+    Parameters:
+        days (int): Length of the period, ending now.
+        limit (int): Number of terms.
+
+    Returns:
+        DataFrame: 'Search Term', 'Not Available' and 'Searches' columns, most missed first.
+    """
+    flush_search_log()
+    with closing(_db.connect()) as conn:
+        rows = conn.execute(
+            "SELECT term, SUM(unavailable_count), SUM(search_count) FROM search_daily "
+            "WHERE day >= ? GROUP BY term HAVING SUM(unavailable_count) > 0 ORDER BY 2 DESC LIMIT ?",
+            (_since(days)[:10], limit),
+        ).fetchall()
+    return pd.DataFrame(rows, columns=["Search Term", "Not Available", "Searches"])
+
+
+def get_previous_searches():
+    """
+    Returns how often each term has been searched.
+
+    Returns:
+        dict: {search term: search count}
+    """
+    with closing(_db.connect()) as conn:
+        return dict(conn.execute("SELECT term, search_count FROM search_terms").fetchall())
+
+
+# (newest search event id, Popularity) from the last time the search counts were read
+_popularity = None
+_popularity_lock = threading.Lock()
+
+
+def search_popularity():
+    """
+    Returns how often each term has been searched, for ranking fuzzy matches.
+
+    The counts are read again only once a new search has been written, so
+    reruns of the search box do not read the whole search_terms table.
+
+    Returns:
+        Popularity: Shared by every session; treat as read-only.
+    """
+    global _popularity
+    with closing(_db.connect()) as conn:
+        version = conn.execute("SELECT MAX(id) FROM search_events").fetchone()[0]
+    with _popularity_lock:
+        if _popularity is not None and _popularity[0] == version:
+            return _popularity[1]
+    popularity = Popularity(get_previous_searches())
+    with _popularity_lock:
+        _popularity = (version, popularity)
+    return popularity
+
 
 # Example usage
 #if __name__ == "__main__":
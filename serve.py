@@ -0,0 +1,74 @@
+"""
+Starts the app with its caches warmed before the first visitor arrives.
+
+Use it in place of `streamlit run csdProductAvaibility.py`, with the same options:
+    python serve.py [--server.port 8501 ...]
+
+While the server starts, a background thread imports the app's modules and
+builds the stock catalogs, search indexes and header and marquee images, which
+the first page view would otherwise build itself. A visitor arriving before it
+finishes waits for the same work instead of repeating it. The timings are
+shown under Performance in the Admin Panel.
+"""
+import os
+import sys
+import threading
+import time
+
+from stage_timings import record_startup, start_process_clock
+
+# The startup is measured from here
+start_process_clock()
+
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csdProductAvaibility.py")
+
+
+def warmup(upload_dir=None):
+    """
+    Imports the app's modules and builds the shared caches the first page view needs.
+
+    Parameters:
+        upload_dir (str): Directory holding the stock workbooks; the app's UPLOAD_DIR by default.
+
+    Returns:
+        dict: Seconds spent on each step.
+    """
+    started = time.perf_counter()
+    steps = {}
+
+    start = time.perf_counter()
+    import assets
+    import demand_panel  # noqa: F401
+    import search_tracking  # noqa: F401
+    import stock_catalog
+    steps["warmup_imports"] = time.perf_counter() - start
+    if upload_dir is None:
+        upload_dir = stock_catalog.UPLOAD_DIR
+
+    # Workbooks without a snapshot are parsed here; the rest are read from their snapshots
+    start = time.perf_counter()
+    stock_catalog.get_merged_catalog(upload_dir)
+    steps["warmup_catalog"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assets.header_html(*assets.HEADER_LOGOS)
+    assets.marquee_html(assets.MARQUEE_FOLDER)
+    steps["warmup_assets"] = time.perf_counter() - start
+
+    steps["warmup"] = time.perf_counter() - started
+    for name, seconds in steps.items():
+        record_startup(name, seconds)
+    return steps
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+
+    from streamlit.web import cli
+    cli.main(["run", APP_SCRIPT, *args], prog_name="streamlit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+from contextlib import closing
+
+
+# Seconds a writer waits for another process holding the database lock
+DB_TIMEOUT = 30
+
+
+class SqliteStore:
+    """
+    A SQLite database shared by every session and process of the app.
+
+    The first connection in a process switches the file to WAL, creates the
+    tables and runs the owner's one-off setup, such as importing the
+    spreadsheets earlier versions wrote.
+    """
+
+    def __init__(self, path, schema, setup=None):
+        self.path = path
+        self.schema = schema
+        self.setup = setup
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=DB_TIMEOUT)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        # Create the tables once per process
+        with self._init_lock:
+            if self._initialized:
+                return
+            with closing(self._open()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")  # Readers never block the writer and vice versa
+                conn.executescript(self.schema)
+                if self.setup is not None:
+                    self.setup(conn)
+            self._initialized = True
+
+    def connect(self):
+        """
+        Opens a connection, creating the database first if this process has not yet.
+
+        Returns:
+            sqlite3.Connection: The caller closes it, e.g. with contextlib.closing.
+        """
+        self._init_db()
+        return self._open()
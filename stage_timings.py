@@ -0,0 +1,152 @@
+import functools
+import io
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+# Most recent timings kept in memory; older ones are dropped
+RING_SIZE = 5000
+
+# Timings are off unless switched on here or from the Admin Panel
+_enabled = os.environ.get("CSD_TIMINGS", "").lower() in ("1", "true", "yes")
+_samples = deque(maxlen=RING_SIZE)
+# Calls per stage since the process started or the timings were cleared, including dropped ones
+_counts = Counter()
+_lock = threading.Lock()
+
+# One-off startup measurements, kept whether or not timings are enabled.
+# The process clock is only started by serve.py, the one place that knows when the server started.
+_process_started = None
+_startup = {}
+
+
+def timings_enabled():
+    return _enabled
+
+
+def enable_timings(enabled=True):
+    # Switch recording on or off for every session of this process
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def record_timing(stage, seconds):
+    with _lock:
+        _samples.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), stage, seconds * 1000))
+        _counts[stage] += 1
+
+
+def timed(stage=None):
+    # Decorator timing every call of a function; the stage defaults to the function name
+    def decorate(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_timing(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def record_startup(name, seconds):
+    # Only the first value of each measurement is kept, so callers can report on every run
+    with _lock:
+        _startup.setdefault(name, seconds)
+
+
+def start_process_clock():
+    # Marks the server start; since_process_start measures from here
+    global _process_started
+    with _lock:
+        if _process_started is None:
+            _process_started = time.perf_counter()
+
+
+def since_process_start():
+    # Seconds since start_process_clock, or None when the server was not started through serve.py
+    if _process_started is None:
+        return None
+    return time.perf_counter() - _process_started
+
+
+def startup_timings():
+    """
+    Returns the startup measurements of this process.
+
+    Returns:
+        dict: {measurement: seconds}, in the order they were recorded.
+    """
+    with _lock:
+        return dict(_startup)
+
+
+def get_timings():
+    """
+    Returns the timings still held in the ring buffer, oldest first.
+
+    Returns:
+        DataFrame: 'Recorded At', 'Stage' and 'Milliseconds' columns.
+    """
+    import pandas as pd
+
+    with _lock:
+        samples = list(_samples)
+    return pd.DataFrame(samples, columns=["Recorded At", "Stage", "Milliseconds"])
+
+
+def timing_summary():
+    """
+    Returns per-stage statistics over the timings in the ring buffer.
+
+    Returns:
+        DataFrame: 'Stage', 'Calls' (since start or last clear), 'Recent',
+            'p50 ms', 'p95 ms' and 'Max ms', slowest p95 first.
+    """
+    import pandas as pd
+
+    timings = get_timings()
+    with _lock:
+        counts = dict(_counts)
+    if timings.empty:
+        return pd.DataFrame(columns=["Stage", "Calls", "Recent", "p50 ms", "p95 ms", "Max ms"])
+    grouped = timings.groupby("Stage")["Milliseconds"]
+    summary = pd.DataFrame({
+        "Recent": grouped.size(),
+        "p50 ms": grouped.quantile(0.5),
+        "p95 ms": grouped.quantile(0.95),
+        "Max ms": grouped.max(),
+    }).round(2)
+    summary.insert(0, "Calls", [counts.get(stage, 0) for stage in summary.index])
+    return summary.sort_values("p95 ms", ascending=False).rename_axis("Stage").reset_index()
+
+
+def export_timings():
+    """
+    Builds a CSV of the timings in the ring buffer.
+
+    Returns:
+        bytes or None: The CSV contents, or None when nothing has been recorded.
+    """
+    timings = get_timings()
+    if timings.empty:
+        return None
+    buffer = io.StringIO()
+    timings.to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8")
+
+
+def clear_timings():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
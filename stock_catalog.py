@@ -0,0 +1,898 @@
+import dataclasses
+import math
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from search_index import PrefixCompleter, SearchIndex
+from stage_timings import timed
+from stock_history import record_version
+
+
+# Maximum number of parsed workbooks, and merged catalogs, kept in memory across all sessions
+CATALOG_CACHE_SIZE = 16
+
+# Directory holding the live stock workbooks
+UPLOAD_DIR = "uploaded_files"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Directory for the processed Parquet snapshots of uploaded workbooks
+SNAPSHOT_DIR = "catalog_snapshots"
+os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+# New uploads are written here and processed before they replace the live stock file
+STAGING_DIR = "upload_staging"
+os.makedirs(STAGING_DIR, exist_ok=True)
+
+# Schema metadata key recording which workbook version a snapshot was built from
+SOURCE_KEY = b"csd.source"
+
+# Completions offered for what the user has typed in the item search
+AUTOCOMPLETE_LIMIT = 20
+
+# Columns a stock workbook must have
+REQUIRED_COLUMNS = ['Index No', 'Item Description', 'RRATE', 'Closing']
+
+# Worksheet rows read and processed at a time when building a snapshot
+INGEST_CHUNK_ROWS = 5000
+
+# Most worker processes parsing workbooks when several need a snapshot at once
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Column of a merged catalog naming the workbook each row comes from
+SOURCE_COLUMN = 'Source'
+
+# Cell text that pandas.read_excel reads as a missing value
+MISSING_TEXT = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+# Columns of a snapshot file; 'Closing' is kept for the stock history and is not shown
+SNAPSHOT_SCHEMA = pa.schema([
+    ('S.No', pa.int64()),
+    ('Index No', pa.string()),
+    ('Item Description', pa.string()),
+    ('Price', pa.string()),
+    ('Available', pa.string()),
+    ('Closing', pa.float64()),
+])
+DISPLAY_COLUMNS = ['S.No', 'Index No', 'Item Description', 'Price', 'Available']
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Processed stock workbook shared by every session.
+
+    The frame, the search index and the completer are shared between sessions
+    and must be treated as read-only.
+    """
+    path: str
+    processed: pd.DataFrame
+    items: tuple
+    index: SearchIndex
+    completer: PrefixCompleter
+    # Row orders for the stock table, computed on first use per (column, ascending)
+    sort_orders: dict = field(default_factory=dict, compare=False, repr=False)
+
+
+def make_catalog(path, processed, items, previous=None):
+    # The search index is built once per snapshot, reusing the work done for unchanged descriptions
+    descriptions = processed['Item Description'] if 'Item Description' in processed.columns else []
+    index = SearchIndex(descriptions, previous=previous.index if previous is not None else None)
+    return Catalog(path=path, processed=processed, items=tuple(items), index=index, completer=PrefixCompleter(items))
+
+
+# Process-wide cache of Catalog objects keyed on (path, size, mtime)
+_catalog_cache = OrderedDict()
+_catalog_lock = threading.Lock()
+# One lock per path so concurrent sessions parse a workbook only once
+_load_locks = {}
+
+
+@timed()
+def load_data(file):
+    try:
+        if file.endswith('.xlsx'):
+            data = pd.read_excel(file, engine='openpyxl')
+        elif file.endswith('.xls'):
+            data = pd.read_excel(file, engine='xlrd')
+        else:
+            st.error(f"Unsupported file format: {file}")
+            return None
+    except Exception as e:
+        st.error(f"Error loading file {os.path.basename(file)}: {e}")
+        return None
+    return data
+
+
+def _has_special_characters(values):
+    # Only text values can contain special characters; numbers and NaN never match
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ('string', 'empty'):
+        return values.str.contains(r'[^\w\s]', regex=True, na=False).astype(bool)
+    if kind not in ('mixed', 'mixed-integer'):
+        return pd.Series(False, index=values.index)
+    # Mixed columns: run the regex over the text values only, which is much cheaper
+    is_text = values.map(type).eq(str).to_numpy()
+    special = np.zeros(len(values), dtype=bool)
+    special[is_text] = values[is_text].str.contains(r'[^\w\s]', regex=True).to_numpy(dtype=bool)
+    return pd.Series(special, index=values.index)
+
+
+def _parse_rates(rate):
+    # Returns the rates as floats and a mask of the values float() accepts
+    numbers = pd.to_numeric(rate, errors='coerce').to_numpy(dtype=float)
+    parsed = ~np.isnan(numbers)
+    # float() also accepts a few spellings to_numeric rejects (e.g. 'nan', '1_000'); retry only those
+    retry = ~parsed & rate.notna().to_numpy()
+    if retry.any():
+        retried = [_to_float(value) for value in rate.to_numpy()[retry]]
+        numbers[retry] = [np.nan if value is None else value for value in retried]
+        parsed[retry] = [value is not None for value in retried]
+    return numbers, parsed
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_prices(numbers):
+    # Prices repeat a lot across a catalog, so format each distinct value only once
+    uniques, inverse = np.unique(numbers, return_inverse=True)
+    return np.array(['%.2f' % value for value in uniques], dtype=object)[inverse]
+
+
+@timed()
+def process_data(data, extra_columns=()):
+    required_columns = REQUIRED_COLUMNS
+
+    # Check for missing required columns
+    if not all(col in data.columns for col in required_columns):
+        st.error("Missing required columns in data.")
+        return pd.DataFrame()  # Return empty DataFrame
+
+    # Remove rows with None or special characters in 'Index No'
+    data = data.dropna(subset=required_columns)  # Drop rows with NaN values in required columns
+    data = data[~_has_special_characters(data['Index No'])]  # Remove rows with special characters in 'Index No'
+
+    # Remove rows where 'Item Description' contains more than one consecutive '-'
+    data = data[~data['Item Description'].str.contains('--', regex=False, na=False)]  # Exclude descriptions with more than one hyphen
+
+    # Remove rows where 'Item Description' is NaN
+    data = data.dropna(subset=['Item Description'])  # Remove rows where 'Item Description' is NaN
+
+    # Format 'RRATE' as the price, and mark zero or unparseable rates as 'Soon Available'
+    rate = data['RRATE']
+    numbers, parsed = _parse_rates(rate)
+    has_price = (rate.notna() & rate.ne(0)).to_numpy() & parsed
+    prices = np.full(len(data), 'Soon Available', dtype=object)
+    prices[has_price] = _format_prices(numbers[has_price])
+    data = data.assign(Price=prices)
+
+    # Determine availability based on 'Closing'
+    closing = data['Closing']
+    in_stock = (closing.notna() & closing.ne(0)).to_numpy()
+    data = data.assign(Available=np.where(in_stock, 'YES', 'SOON AVAILABLE').astype(object))
+
+    # Select only the required columns
+    data = data[['Index No', 'Item Description', 'Price', 'Available', *extra_columns]]
+
+    # Reset index and adjust index to start from 1
+    data.reset_index(drop=True, inplace=True)
+    data.index += 1
+    data.index.name = 'S.No'
+    data.reset_index(inplace=True)
+
+    return data
+
+
+@timed()
+def search_data(data, search_term):
+    # The term is matched literally, so descriptions containing '(', '+' or '.' are safe to search for
+    if search_term:
+        return data[data['Item Description'].str.contains(search_term, case=False, na=False, regex=False)]
+    return data
+
+
+def extract_items(data):
+    # Ensure the necessary column is present
+    if 'Item Description' in data.columns:
+        # Remove rows with NaN or multiple consecutive hyphens in 'Item Description'
+        df = data.dropna(subset=['Item Description'])  # Remove rows where 'Item Description' is NaN
+        df = df[~df['Item Description'].str.contains('--', regex=False, na=False)]  # Exclude rows with more than one consecutive hyphen
+        return tuple(df['Item Description'].tolist())
+    return ()
+
+
+@timed()
+def search_catalog(catalog, search_term, all_words=False):
+    # Filter the processed rows and number the matches from 1, as process_data would;
+    # with all_words, each word may appear anywhere in the description, e.g. 'amul 100g'
+    if catalog.processed.empty:
+        return catalog.processed
+    if search_term:
+        results = catalog.processed.iloc[catalog.index.search(search_term, all_words)].reset_index(drop=True)
+    else:
+        results = catalog.processed.reset_index(drop=True)
+    results['S.No'] = range(1, len(results) + 1)
+    return results
+
+
+def sort_order(catalog, sort_by, ascending=True):
+    # Row positions of the catalog sorted by one column, shared by every session
+    key = (sort_by, ascending)
+    order = catalog.sort_orders.get(key)
+    if order is None:
+        values = catalog.processed[sort_by].reset_index(drop=True)
+        if sort_by == 'Price':
+            values = pd.to_numeric(values, errors='coerce')  # 'Soon Available' sorts last
+        elif values.dtype == object:
+            values = values.str.lower()
+        order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        catalog.sort_orders[key] = order
+    return order
+
+
+@timed()
+def page_rows(catalog, page=1, page_size=50, sort_by='S.No', ascending=True):
+    """
+    Returns one page of the processed catalog.
+
+    Only the requested rows are taken from the shared frame, so the cost of
+    rendering a page does not depend on the size of the catalog.
+
+    Parameters:
+        catalog (Catalog): Catalog to page through.
+        page (int): Page number, starting from 1. Out of range pages are clamped.
+        page_size (int): Number of rows per page.
+        sort_by (str): Column to sort on.
+        ascending (bool): Sort direction.
+
+    Returns:
+        tuple: (rows on the page, total number of rows)
+    """
+    data = catalog.processed
+    total = len(data)
+    if total == 0:
+        return data, 0
+    pages = math.ceil(total / page_size)
+    start = (min(max(page, 1), pages) - 1) * page_size
+    if sort_by == 'S.No' and ascending:
+        rows = data.iloc[start:start + page_size]
+    else:
+        rows = data.iloc[sort_order(catalog, sort_by, ascending)[start:start + page_size]]
+    return rows.reset_index(drop=True), total
+
+
+@timed()
+def fuzzy_search_catalog(catalog, query, popularity=None, limit=20):
+    # Closest matches for free text, best first, numbered from 1
+    if catalog.processed.empty:
+        return catalog.processed
+    matches = catalog.index.fuzzy_search(query, limit=limit, popularity=popularity)
+    results = catalog.processed.iloc[[position for position, _ in matches]].reset_index(drop=True)
+    results['S.No'] = range(1, len(results) + 1)
+    return results
+
+
+def _text_column(values):
+    # Parquet needs one type per column: store whole numbers without a trailing '.0'
+    if pd.api.types.is_float_dtype(values) and (values % 1 == 0).all():
+        values = values.astype('int64')
+    return values.astype(str)
+
+
+def snapshot_path(file_path):
+    return os.path.join(SNAPSHOT_DIR, os.path.splitext(os.path.basename(file_path))[0] + ".parquet")
+
+
+def _items_path(file_path):
+    return os.path.join(SNAPSHOT_DIR, os.path.splitext(os.path.basename(file_path))[0] + ".items.parquet")
+
+
+def _cell_value(value):
+    # Match what pandas.read_excel returns for a cell
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in MISSING_TEXT:
+        return None
+    return value
+
+
+def read_workbook_chunks(file_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    Reads the required columns of a workbook's first sheet a chunk of rows at a time.
+
+    The header row is checked before any data row is read, and only one chunk
+    is held in memory, however large the workbook is.
+
+    Parameters:
+        file_path (str): Path of the .xlsx workbook.
+        chunk_rows (int): Number of rows per chunk.
+
+    Yields:
+        tuple: (DataFrame with the REQUIRED_COLUMNS, rows read so far,
+            total data rows as reported by the sheet or None)
+
+    Raises:
+        ValueError: If the header row lacks a required column.
+    """
+    # openpyxl is only needed when a workbook is parsed, so it is not loaded at startup
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(cell) if cell is not None else '' for cell in next(rows, ())]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"Missing required columns in data: {', '.join(missing)}")
+        positions = [header.index(column) for column in REQUIRED_COLUMNS]
+        total = sheet.max_row - 1 if sheet.max_row else None
+
+        chunk = []
+        done = 0
+        for row in rows:
+            chunk.append([_cell_value(row[p]) if p < len(row) else None for p in positions])
+            if len(chunk) == chunk_rows:
+                done += len(chunk)
+                yield pd.DataFrame(chunk, columns=REQUIRED_COLUMNS), done, total
+                chunk = []
+        if chunk or not done:
+            done += len(chunk)
+            yield pd.DataFrame(chunk, columns=REQUIRED_COLUMNS), done, total
+    finally:
+        workbook.close()
+
+
+def _snapshot_table(processed):
+    # One chunk of processed rows in the snapshot schema
+    if processed.empty:
+        return SNAPSHOT_SCHEMA.empty_table()
+    processed = processed.assign(
+        **{
+            'Index No': _text_column(processed['Index No']),
+            'Item Description': _text_column(processed['Item Description']),
+            'Closing': pd.to_numeric(processed['Closing'], errors='coerce').astype(float),
+        }
+    )
+    return pa.Table.from_pandas(processed[SNAPSHOT_SCHEMA.names], schema=SNAPSHOT_SCHEMA, preserve_index=False)
+
+
+@timed()
+def write_snapshot(file_path, progress=None):
+    """
+    Parses a workbook and stores the processed rows as a Parquet snapshot.
+
+    The workbook is streamed in chunks and each chunk is written to the snapshot
+    as soon as it is processed, so memory use does not grow with the workbook.
+
+    Parameters:
+        file_path (str): Path of the stock workbook.
+        progress (callable): Called as progress(rows read, total rows or None)
+            after every chunk.
+
+    Raises:
+        ValueError: If the header row lacks a required column.
+        Exception: Whatever openpyxl raises for a file it cannot read.
+    """
+    source_key = "%d:%d" % _cache_key(file_path)[1:]
+    path = snapshot_path(file_path)
+    items_path = _items_path(file_path)
+    schema = SNAPSHOT_SCHEMA.with_metadata({SOURCE_KEY: source_key.encode()})
+    items_schema = pa.schema([('Item Description', pa.string())])
+
+    written = 0
+    try:
+        with pq.ParquetWriter(path + ".tmp", schema) as writer, \
+                pq.ParquetWriter(items_path + ".tmp", items_schema) as items_writer:
+            for chunk, done, total in read_workbook_chunks(file_path):
+                processed = process_data(chunk, extra_columns=['Closing'])
+                processed['S.No'] += written
+                written += len(processed)
+                writer.write_table(_snapshot_table(processed).replace_schema_metadata(schema.metadata))
+                items = [str(item) for item in extract_items(chunk)]
+                items_writer.write_table(pa.table({'Item Description': pa.array(items, type=pa.string())}))
+                if progress is not None:
+                    progress(done, total)
+    except Exception:
+        for tmp_path in (path + ".tmp", items_path + ".tmp"):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    # Rename into place so readers never see a partial snapshot
+    os.replace(items_path + ".tmp", items_path)
+    os.replace(path + ".tmp", path)
+
+
+def build_snapshot(file_path, previous=None, progress=None):
+    """
+    Parses an uploaded workbook once, stores its snapshot and returns the catalog.
+
+    Parameters:
+        file_path (str): Path of the uploaded stock workbook.
+        previous (Catalog): Catalog being replaced; its search index is reused
+            for descriptions that did not change.
+        progress (callable): Called as progress(rows read, total rows or None)
+            after every chunk.
+
+    Returns:
+        Catalog or None: None when the workbook cannot be loaded.
+    """
+    try:
+        write_snapshot(file_path, progress)
+    except Exception as e:
+        st.error(f"Error loading file {os.path.basename(file_path)}: {e}")
+        return None
+    return read_snapshot(file_path, previous)
+
+
+def _record_history(directory, source):
+    # Store the rows of every live workbook as a stock version; called with the directory lock held
+    columns = ['Index No', 'Item Description', 'Price', 'Closing']
+    frames = []
+    for path in stock_files(directory):
+        if not _snapshot_is_current(path):
+            # A workbook that cannot be parsed has no snapshot; it is not in the merged catalog either
+            print(f"Stock history: {os.path.basename(path)} has no snapshot and was left out.")
+            continue
+        rows = pq.read_table(snapshot_path(path), columns=columns, memory_map=True).to_pandas()
+        frames.append(rows.assign(**{SOURCE_COLUMN: source_name(path)}))
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[SOURCE_COLUMN, *columns])
+    record_version(os.path.basename(source), rows)
+
+
+@timed()
+def read_snapshot(file_path, previous=None):
+    """
+    Reads the Parquet snapshot of a workbook if it matches the workbook on disk.
+
+    Parameters:
+        file_path (str): Path of the uploaded stock workbook.
+        previous (Catalog): Catalog whose search index can be reused.
+
+    Returns:
+        Catalog or None: None when there is no up-to-date snapshot.
+    """
+    if not _snapshot_is_current(file_path):
+        return None
+    try:
+        processed = pq.read_table(snapshot_path(file_path), columns=DISPLAY_COLUMNS, memory_map=True).to_pandas()
+        items = pq.read_table(_items_path(file_path), memory_map=True).column('Item Description').to_pylist()
+    except (OSError, pa.ArrowException, AttributeError):
+        return None
+    return make_catalog(file_path, processed, items, previous)
+
+
+def _snapshot_is_current(file_path):
+    # True when the workbook has a snapshot built from its current version
+    path = snapshot_path(file_path)
+    if not (os.path.exists(path) and os.path.exists(_items_path(file_path))):
+        return False
+    try:
+        source_key = "%d:%d" % _cache_key(file_path)[1:]
+        return pq.read_schema(path).metadata.get(SOURCE_KEY) == source_key.encode()
+    except (OSError, pa.ArrowException, AttributeError):
+        return False
+
+
+def delete_snapshot(file_path):
+    for path in (snapshot_path(file_path), _items_path(file_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _cache_key(file_path):
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+
+def get_catalog(file_path):
+    """
+    Returns the processed workbook, reading its snapshot only when the file changed.
+
+    Parameters:
+        file_path (str): Path of the uploaded stock workbook.
+
+    Returns:
+        Catalog or None: None when the file is missing or cannot be loaded.
+    """
+    try:
+        key = _cache_key(file_path)
+    except OSError:
+        return None
+
+    with _catalog_lock:
+        catalog = _catalog_cache.get(key)
+        if catalog is not None:
+            _catalog_cache.move_to_end(key)
+            return catalog
+
+    with _load_lock(file_path):
+        # Another session may have parsed the file, or an upload replaced it, while we were waiting
+        try:
+            key = _cache_key(file_path)
+        except OSError:
+            return None
+        with _catalog_lock:
+            catalog = _catalog_cache.get(key)
+        if catalog is not None:
+            return catalog
+
+        # Workbooks uploaded before snapshots existed are converted on first use
+        catalog = read_snapshot(file_path) or build_snapshot(file_path)
+        if catalog is None:
+            return None
+
+        _store_catalog(key, catalog)
+    return catalog
+
+
+def _store_catalog(key, catalog):
+    with _catalog_lock:
+        # Drop stale versions of the same file before inserting the new one
+        for stale_key in [k for k in _catalog_cache if k[0] == key[0]]:
+            del _catalog_cache[stale_key]
+        _catalog_cache[key] = catalog
+        while len(_catalog_cache) > CATALOG_CACHE_SIZE:
+            _catalog_cache.popitem(last=False)
+
+
+def _load_lock(file_path):
+    with _catalog_lock:
+        return _load_locks.setdefault(os.path.abspath(file_path), threading.Lock())
+
+
+def _directory_lock(directory):
+    # Held while the set of stock files in a directory changes, and while it is listed or merged
+    return _load_lock(os.path.join(os.path.abspath(directory), '*'))
+
+
+def stock_files(directory):
+    # Stock workbooks in a directory, in name order
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith('.xlsx')]
+
+
+def source_name(file_path):
+    # How a workbook is named in the 'Source' column: its file name without the extension
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def _is_cached(file_path):
+    try:
+        key = _cache_key(file_path)
+    except OSError:
+        return False
+    with _catalog_lock:
+        return key in _catalog_cache
+
+
+def _write_snapshot_worker(file_path):
+    # Runs in a parse worker; the error is returned as text because not every exception can be pickled
+    try:
+        write_snapshot(file_path)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+@timed()
+def get_catalogs(file_paths):
+    """
+    Returns the catalogs of several workbooks, parsing those without an up-to-date snapshot in parallel.
+
+    Each stale workbook is parsed in its own worker process, so loading several
+    new files takes about as long as the largest of them on a machine with
+    enough cores. The catalogs are then read from the snapshots as get_catalog does.
+
+    Parameters:
+        file_paths (list): Paths of the stock workbooks.
+
+    Returns:
+        list: One Catalog, or None when the file is missing or cannot be loaded, per path.
+    """
+    stale = sorted(path for path in set(file_paths) if not _is_cached(path) and os.path.exists(path) and not _snapshot_is_current(path))
+    failed = set()
+    if len(stale) > 1:
+        # Hold the load locks, in a fixed order, so other sessions wait for these parses instead of repeating them
+        locks = [_load_lock(path) for path in stale]
+        for lock in locks:
+            lock.acquire()
+        try:
+            # One process per file, up to PARSE_WORKERS. The pool lives only for this batch: an
+            # idle worker holds over 100 MB and new files arrive a few times a day at most.
+            # Spawned, not forked: a fork would copy the server's threads and locks in whatever state they are in
+            with ProcessPoolExecutor(max_workers=min(len(stale), PARSE_WORKERS), mp_context=multiprocessing.get_context("spawn")) as pool:
+                errors = list(pool.map(_write_snapshot_worker, stale))
+        except Exception:
+            # A worker died; get_catalog below parses the files in this process instead
+            errors = [None] * len(stale)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        for path, error in zip(stale, errors):
+            if error is not None:
+                st.error(f"Error loading file {os.path.basename(path)}: {error}")
+                failed.add(path)
+    return [None if path in failed else get_catalog(path) for path in file_paths]
+
+
+def merge_catalogs(catalogs, path):
+    """
+    Combines several catalogs into one, adding a 'Source' column naming the workbook of each row.
+
+    Parameters:
+        catalogs (list): Catalogs to combine, in the order their rows are listed.
+        path (str): Path recorded on the merged catalog.
+
+    Returns:
+        Catalog: Rows numbered from 1 across all the workbooks.
+    """
+    catalogs = [catalog for catalog in catalogs if not catalog.processed.empty]
+    if len(catalogs) == 1:
+        # Rows, search index and completer are the file's own; only the column is added
+        catalog = catalogs[0]
+        processed = catalog.processed.assign(**{SOURCE_COLUMN: source_name(catalog.path)})
+        return dataclasses.replace(catalog, path=path, processed=processed, sort_orders={})
+    frames = [catalog.processed.assign(**{SOURCE_COLUMN: source_name(catalog.path)}) for catalog in catalogs]
+    if not frames:
+        return make_catalog(path, pd.DataFrame(), [])
+    processed = pd.concat(frames, ignore_index=True)
+    processed['S.No'] = range(1, len(processed) + 1)
+    items = [item for catalog in catalogs for item in catalog.items]
+    index = SearchIndex(processed['Item Description'], previous=[catalog.index for catalog in catalogs])
+    return Catalog(path=path, processed=processed, items=tuple(items), index=index, completer=PrefixCompleter(items))
+
+
+def _file_versions(paths):
+    # The cache keys of several files, or None when one of them is gone
+    try:
+        return tuple(_cache_key(path) for path in paths)
+    except OSError:
+        return None
+
+
+def _merged_key(directory, versions):
+    # Keyed like a file, so a newer merge of the same directory replaces the old one in the cache
+    return (os.path.join(os.path.abspath(directory), '*'), versions)
+
+
+def get_merged_catalog(directory):
+    """
+    Returns one catalog over every stock workbook in a directory.
+
+    Search, completion and availability then cover all the uploaded files at
+    once. The merged catalog is cached like a single workbook's and rebuilt
+    only when one of the files changes, is added or is removed.
+
+    Parameters:
+        directory (str): Directory holding the stock workbooks.
+
+    Returns:
+        Catalog or None: None when no workbook can be loaded.
+    """
+    while True:
+        with _directory_lock(directory):
+            # Not while an upload is swapping files, which would show the old and new workbooks side by side
+            paths = stock_files(directory)
+            listed = _file_versions(paths)
+        loaded = get_catalogs(paths)
+        with _directory_lock(directory):
+            if _file_versions(stock_files(directory)) == listed:
+                break
+        # An upload or delete changed the files while they were loading, so some of the
+        # catalogs may be of the old set and some of the new; load the new set instead
+    if listed is None:
+        return None
+    catalogs = [catalog for catalog in loaded if catalog is not None]
+    if not catalogs:
+        return None
+    key = _merged_key(directory, tuple(version for version, catalog in zip(listed, loaded) if catalog is not None))
+
+    with _catalog_lock:
+        merged = _catalog_cache.get(key)
+        if merged is not None:
+            _catalog_cache.move_to_end(key)
+            return merged
+    with _directory_lock(directory):
+        with _catalog_lock:
+            merged = _catalog_cache.get(key)
+        if merged is None:
+            merged = merge_catalogs(catalogs, key[0])
+            _store_catalog(key, merged)
+    return merged
+
+
+@dataclass
+class UploadJob:
+    """
+    An upload being processed in the background.
+
+    The worker updates the counters, the error and the warning; sessions only read them.
+    """
+    target: str
+    rows_read: int = 0
+    total_rows: int = None
+    # Why the upload failed; the live stock is then unchanged
+    error: str = None
+    # What went wrong after the new stock went live
+    warning: str = None
+    future: object = field(default=None, repr=False)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+# Uploads are processed one at a time, away from the sessions serving pages
+_upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-upload")
+
+
+def stage_upload(data, target_path, replaces=()):
+    """
+    Saves an uploaded workbook to the staging area and processes it in the background.
+
+    The live stock files keep being served until the new workbook has been
+    parsed, validated and indexed. The new file and its snapshot are then
+    renamed into place in one step, and the replaced files are removed.
+
+    Parameters:
+        data (bytes): Contents of the uploaded workbook.
+        target_path (str): Path the workbook is published under.
+        replaces (list): Paths of the stock files the upload replaces.
+
+    Returns:
+        UploadJob: Progress and outcome of the upload.
+    """
+    staging_path = os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}.xlsx")
+    with open(staging_path, "wb") as f:
+        f.write(data)
+    job = UploadJob(target=target_path)
+    job.future = _upload_executor.submit(_publish_upload, job, staging_path, list(replaces))
+    return job
+
+
+def _publish_upload(job, staging_path, replaces):
+    target_path = job.target
+
+    def progress(done, total):
+        job.rows_read, job.total_rows = done, total
+
+    try:
+        write_snapshot(staging_path, progress)
+        with _catalog_lock:
+            # The most recently used catalog is the one this upload replaces
+            previous = next(reversed(_catalog_cache.values()), None)
+        # Build the search index now, before any session can see the new file
+        staged = read_snapshot(staging_path, previous)
+        if staged is None:
+            raise OSError("The processed snapshot could not be read back")
+        catalog = dataclasses.replace(staged, path=target_path)
+
+        # The merged catalog is built here too, so the first search after the upload finds it ready
+        directory = os.path.dirname(target_path)
+        gone = {os.path.abspath(path) for path in [target_path, *replaces]}
+        kept = [path for path in stock_files(directory) if os.path.abspath(path) not in gone]
+        live = [c for c in get_catalogs(kept) if c is not None] + [catalog]
+        live.sort(key=lambda c: os.path.basename(c.path))
+        merged = merge_catalogs(live, _merged_key(directory, ())[0])
+    except Exception as e:
+        job.error = str(e)
+        _discard_staging(staging_path)
+        return None
+
+    with _directory_lock(directory), _load_lock(target_path):
+        try:
+            # The replaced files go first, so no reader ever lists the old and new workbooks together
+            for path in replaces:
+                if os.path.abspath(path) == os.path.abspath(target_path):
+                    continue
+                if os.path.exists(path):
+                    os.remove(path)
+                delete_snapshot(path)
+                invalidate_catalog(path)
+            # A rename keeps the size and mtime the snapshot is keyed on, so the
+            # snapshot goes first and the workbook itself is the atomic switch
+            os.replace(_items_path(staging_path), _items_path(target_path))
+            os.replace(snapshot_path(staging_path), snapshot_path(target_path))
+            os.replace(staging_path, target_path)
+        except Exception as e:
+            job.error = str(e)
+            _discard_staging(staging_path)
+            return None
+
+        # The new stock is live from here on; what follows only saves work for later readers
+        _store_catalog(_cache_key(target_path), catalog)
+        try:
+            try:
+                _store_catalog(_merged_key(directory, tuple(_cache_key(c.path) for c in live)), merged)
+            except OSError:
+                # Another file was deleted meanwhile; the next reader merges the files that are left
+                pass
+            _record_history(directory, target_path)
+        except Exception as e:
+            job.warning = f"The stock history was not updated: {e}"
+    return catalog
+
+
+def _discard_staging(staging_path):
+    # Remove whatever a failed upload left in the staging area
+    for path in (staging_path, snapshot_path(staging_path), _items_path(staging_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def delete_stock_file(file_path):
+    """
+    Removes an uploaded workbook with its snapshot and cached catalog, and records the change in the stock history.
+
+    Parameters:
+        file_path (str): Path of the stock workbook.
+
+    Returns:
+        str or None: Why the stock history could not be updated; the file is deleted either way.
+    """
+    directory = os.path.dirname(file_path)
+    with _directory_lock(directory), _load_lock(file_path):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        delete_snapshot(file_path)
+        invalidate_catalog(file_path)
+        try:
+            _record_history(directory, file_path)
+        except Exception as e:
+            return str(e)
+    return None
+
+
+def invalidate_catalog(file_path=None):
+    # Forget cached entries for one file, or for every file when no path is given
+    with _catalog_lock:
+        if file_path is None:
+            _catalog_cache.clear()
+            return
+        path = os.path.abspath(file_path)
+        for key in [k for k in _catalog_cache if k[0] == path]:
+            del _catalog_cache[key]
+
+
+def complete_items(catalog, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Returns the item descriptions completing what the user has typed.
+
+    Parameters:
+        catalog (Catalog): Catalog to complete from, or None when there is none.
+        prefix (str): Text typed so far.
+        limit (int): Maximum number of completions.
+
+    Returns:
+        list: Up to limit descriptions, best first.
+    """
+    if catalog is None:
+        return []
+    return catalog.completer.complete(prefix, limit)
+
+
+# Function to get items based on item description (without filtering on 'CLOSING')
+def get_items(file_path):
+    catalog = get_catalog(file_path)
+    if catalog is None:
+        return []
+    return list(catalog.items)
@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# Directory holding one processed copy of the live stock after every upload or deletion
+HISTORY_DIR = "stock_history"
+os.makedirs(HISTORY_DIR, exist_ok=True)
+
+MANIFEST_FILE = os.path.join(HISTORY_DIR, "manifest.json")
+
+# Number of versions kept; older versions are removed
+HISTORY_LIMIT = 60
+
+# Columns stored for each version; rows from every live workbook, told apart by 'Source'
+VERSION_COLUMNS = ['Source', 'Index No', 'Item Description', 'Price', 'Closing']
+
+# Rows are compared per workbook, as one Index No can be listed in several
+VERSION_KEY = ['Source', 'Index No']
+
+DELTA_COLUMNS = ['Change', 'Source', 'Index No', 'Item Description', 'Old Price', 'New Price', 'Old Closing', 'New Closing']
+
+_history_lock = threading.Lock()
+
+
+def list_versions():
+    """
+    Returns the recorded stock versions, oldest first.
+
+    Returns:
+        list: One dict per version with 'version', 'source', 'created' and change counts.
+    """
+    if not os.path.exists(MANIFEST_FILE):
+        return []
+    with open(MANIFEST_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(versions):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=1)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def _version_dir(version):
+    return os.path.join(HISTORY_DIR, version)
+
+
+def read_version(version):
+    # Stored rows of one version, or an empty frame when there is no such version
+    if version is None:
+        return pd.DataFrame(columns=VERSION_COLUMNS)
+    return pd.read_parquet(os.path.join(_version_dir(version), "stock.parquet"))
+
+
+def diff_versions(old, new):
+    """
+    Compares two versions row by row, keyed on 'Source' and 'Index No'.
+
+    Parameters:
+        old (DataFrame): Rows of the earlier version.
+        new (DataFrame): Rows of the later version.
+
+    Returns:
+        DataFrame: One row per new, removed, price changed or closing changed item.
+    """
+    old = old.drop_duplicates(VERSION_KEY).set_index(VERSION_KEY)
+    new = new.drop_duplicates(VERSION_KEY).set_index(VERSION_KEY)
+    merged = old.join(new, how='outer', lsuffix='_old', rsuffix='_new')
+
+    in_old = merged.index.isin(old.index)
+    in_new = merged.index.isin(new.index)
+    both = in_old & in_new
+    old_closing = merged['Closing_old'].to_numpy(dtype=float)
+    new_closing = merged['Closing_new'].to_numpy(dtype=float)
+    closing_changed = both & ~((old_closing == new_closing) | (np.isnan(old_closing) & np.isnan(new_closing)))
+    price_changed = both & (merged['Price_old'] != merged['Price_new']).to_numpy()
+
+    change = np.select(
+        [~in_old, ~in_new, price_changed, closing_changed],
+        ['new', 'removed', 'price changed', 'closing changed'],
+        default='',
+    )
+    delta = pd.DataFrame({
+        'Change': change,
+        'Source': merged.index.get_level_values('Source'),
+        'Index No': merged.index.get_level_values('Index No'),
+        'Item Description': merged['Item Description_new'].fillna(merged['Item Description_old']).to_numpy(),
+        'Old Price': merged['Price_old'].to_numpy(),
+        'New Price': merged['Price_new'].to_numpy(),
+        'Old Closing': old_closing,
+        'New Closing': new_closing,
+    })
+    return delta[delta['Change'] != ''].reset_index(drop=True)
+
+
+def record_version(source, rows):
+    """
+    Stores the live stock and the delta against the previous version.
+
+    Parameters:
+        source (str): File name of the workbook whose upload or deletion changed the stock.
+        rows (DataFrame): Processed rows of every live workbook, with the VERSION_COLUMNS.
+
+    Returns:
+        DataFrame: The delta against the previous version.
+    """
+    rows = rows[VERSION_COLUMNS].reset_index(drop=True)
+    with _history_lock:
+        versions = list_versions()
+        previous = versions[-1]['version'] if versions else None
+        delta = diff_versions(read_version(previous), rows)
+
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        os.makedirs(_version_dir(version), exist_ok=True)
+        rows.to_parquet(os.path.join(_version_dir(version), "stock.parquet"), index=False)
+        delta.to_parquet(os.path.join(_version_dir(version), "delta.parquet"), index=False)
+
+        counts = delta['Change'].value_counts()
+        versions.append({
+            'version': version,
+            'source': source,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'rows': len(rows),
+            **{change.replace(' ', '_'): int(counts.get(change, 0)) for change in ('new', 'removed', 'price changed', 'closing changed')},
+        })
+        # Keep the most recent versions only
+        for old in versions[:-HISTORY_LIMIT]:
+            shutil.rmtree(_version_dir(old['version']), ignore_errors=True)
+        _write_manifest(versions[-HISTORY_LIMIT:])
+    return delta
+
+
+def read_delta(version):
+    # Changes made by one upload or deletion, as stored when it was recorded
+    return pd.read_parquet(os.path.join(_version_dir(version), "delta.parquet"))
+
+
+def last_delta():
+    # Changes made by the most recent upload or deletion
+    versions = list_versions()
+    if not versions:
+        return pd.DataFrame(columns=DELTA_COLUMNS)
+    return read_delta(versions[-1]['version'])
+
+
+def changes_since(when):
+    """
+    Returns what changed between the stock held at a given time and the latest version.
+
+    Only the stored versions are read; no workbook is parsed again.
+
+    Parameters:
+        when (datetime): Point in time to compare against.
+
+    Returns:
+        DataFrame: The net delta, in the same shape as diff_versions.
+    """
+    versions = list_versions()
+    if not versions:
+        return pd.DataFrame(columns=DELTA_COLUMNS)
+    earlier = [v['version'] for v in versions if datetime.fromisoformat(v['created']) <= when]
+    base = earlier[-1] if earlier else None
+    if base == versions[-1]['version']:
+        return pd.DataFrame(columns=DELTA_COLUMNS)
+    return diff_versions(read_version(base), read_version(versions[-1]['version']))
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The app modules live at the repository root and create their data directories
+# relative to the working directory when imported, so the tests run in a scratch
+# directory and never touch the app's own uploads, snapshots or logs.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+_scratch = tempfile.TemporaryDirectory(prefix="csd-tests-")
+os.chdir(_scratch.name)
@@ -0,0 +1,95 @@
+"""
+The catalog API answers from the merged stock catalog.
+"""
+import json
+import os
+import socket
+import tempfile
+import time
+
+import pandas as pd
+from tornado.testing import AsyncHTTPTestCase
+
+import catalog_api
+
+
+STOCK = pd.DataFrame({
+    'Index No': [1001, 1002, 1003],
+    'Item Description': ['AMUL BUTTER 100G', 'DOVE SOAP 75G', 'TATA TEA 1KG'],
+    'RRATE': [52.5, 38, 0],
+    'Closing': [12, 0, 4],
+})
+
+
+class CatalogApiTest(AsyncHTTPTestCase):
+    def get_app(self):
+        self.upload_dir = tempfile.mkdtemp(prefix="uploads-", dir=os.getcwd())
+        STOCK.to_excel(os.path.join(self.upload_dir, "CANTEEN_STOCK_SUMMARY_API.xlsx"), index=False)
+        return catalog_api.make_app(self.upload_dir)
+
+    def get_json(self, url, **kwargs):
+        response = self.fetch(url, **kwargs)
+        return response, json.loads(response.body) if response.body else None
+
+    def test_search(self):
+        response, body = self.get_json("/api/search?q=butter")
+        self.assertEqual(response.code, 200)
+        self.assertEqual(body['total'], 1)
+        self.assertEqual(body['items'][0], {
+            'index_no': '1001',
+            'description': 'AMUL BUTTER 100G',
+            'price': '52.50',
+            'available': True,
+            'source': 'CANTEEN_STOCK_SUMMARY_API',
+        })
+
+    def test_search_words_in_any_order(self):
+        response, body = self.get_json("/api/search?q=100g%20amul")
+        self.assertEqual(response.code, 200)
+        self.assertEqual([item['description'] for item in body['items']], ['AMUL BUTTER 100G'])
+
+    def test_unchanged_stock_is_not_modified(self):
+        response = self.fetch("/api/search?q=tea")
+        etag = response.headers['ETag']
+        again = self.fetch("/api/search?q=tea", headers={'If-None-Match': etag})
+        self.assertEqual(again.code, 304)
+        self.assertEqual(again.body, b"")
+        # The ETag covers the request URI, so another query is answered in full
+        other = self.fetch("/api/search?q=soap", headers={'If-None-Match': etag})
+        self.assertEqual(other.code, 200)
+
+    def test_unknown_item(self):
+        response, body = self.get_json("/api/items/9999")
+        self.assertEqual(response.code, 404)
+        self.assertIn('9999', body['error'])
+
+    def test_item(self):
+        response, body = self.get_json("/api/items/1002")
+        self.assertEqual(response.code, 200)
+        self.assertEqual(body['item']['available'], False)
+
+    def test_bad_limit(self):
+        response, body = self.get_json("/api/complete?q=a&limit=many")
+        self.assertEqual(response.code, 400)
+        self.assertEqual(body['error'], "limit must be a number")
+
+    def test_availability_of_unknown_items_is_null(self):
+        response, body = self.get_json("/api/availability?index_no=1001,1002&index_no=4242")
+        self.assertEqual(response.code, 200)
+        self.assertEqual(body['availability'], {'1001': True, '1002': False, '4242': None})
+
+
+def test_start_api_server_gives_up_on_a_taken_port(monkeypatch):
+    monkeypatch.setattr(catalog_api, "_server_thread", None)
+    monkeypatch.setattr(catalog_api, "_server_error", None)
+    with socket.socket() as taken:
+        taken.bind(("", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+
+        error = catalog_api.start_api_server(port, os.getcwd())
+        assert error is not None and str(port) in error
+        # Later calls, one per page run, return the same error at once instead of trying again
+        start = time.perf_counter()
+        assert catalog_api.start_api_server(port, os.getcwd()) == error
+        assert time.perf_counter() - start < 0.5
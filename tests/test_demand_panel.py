@@ -0,0 +1,83 @@
+"""
+Demands are stored in SQLite, matched to catalog items and listed while they can be fulfilled.
+"""
+import pandas as pd
+import pytest
+
+import demand_panel
+from sqlite_store import SqliteStore
+from stock_catalog import make_catalog
+
+
+@pytest.fixture(autouse=True)
+def demand_db(tmp_path, monkeypatch):
+    # A fresh database per test
+    monkeypatch.setattr(demand_panel, "DEMAND_DIR", str(tmp_path))
+    store = SqliteStore(str(tmp_path / "demand.db"), demand_panel._SCHEMA, demand_panel._import_old_demands)
+    monkeypatch.setattr(demand_panel, "_db", store)
+    monkeypatch.setattr(demand_panel, "_checked_catalog", None)
+
+
+def demand(service_no="JC-1", product_name="AMUL BUTTER 100G", quantity=1):
+    return {
+        "Service No.": service_no, "Name": "A SINGH", "Product Name": product_name, "Quantity": quantity,
+        "Mobile No.": "9000000000", "Alternate No.": "", "Address": "LINE 4",
+    }
+
+
+def catalog(available):
+    processed = pd.DataFrame({
+        'S.No': [1, 2],
+        'Index No': ['1001', '1002'],
+        'Item Description': ['AMUL BUTTER 100G', 'DOVE SOAP 75G'],
+        'Price': ['52.50', '38.00'],
+        'Available': ['YES' if available else 'SOON AVAILABLE', 'YES'],
+    })
+    return make_catalog("stock.xlsx", processed, processed['Item Description'])
+
+
+def test_same_demand_on_the_same_day_is_stored_once():
+    assert demand_panel.save_demand_data(pd.DataFrame([demand()])) == 1
+    # Spacing and case of the product name do not make it a new demand
+    assert demand_panel.save_demand_data(pd.DataFrame([demand(product_name=" amul  butter 100g")])) == 0
+    assert demand_panel.save_demand_data(pd.DataFrame([demand(quantity=2)])) == 1
+    assert demand_panel.save_demand_data(pd.DataFrame([demand("JC-2")])) == 1
+
+    next_day = pd.DataFrame([{**demand(), "submitted_at": "2099-01-02 09:00:00"}])
+    assert demand_panel.save_demand_data(next_day) == 1
+    assert demand_panel.save_demand_data(next_day.assign(submitted_at="2099-01-02 18:30:00")) == 0
+    assert len(demand_panel.get_demands()) == 4
+
+
+def test_totals_count_product_names_differing_in_case_together():
+    demand_panel.save_demand_data(pd.DataFrame([
+        demand("JC-1", "AMUL BUTTER 100G", 2),
+        demand("JC-2", "amul butter 100g", 3),
+        demand("JC-3", "Amul Butter 100G", 1),
+        demand("JC-4", "DOVE SOAP 75G", 4),
+    ]))
+    totals = demand_panel.demand_totals()
+    assert totals["Product Name"].str.upper().tolist() == ["AMUL BUTTER 100G", "DOVE SOAP 75G"]
+    assert totals["Total Quantity"].tolist() == [6, 4]
+    assert totals["Demands"].tolist() == [3, 1]
+
+
+def test_fulfilled_demands_leave_the_list():
+    demand_panel.save_demand_data(pd.DataFrame([demand("JC-1"), demand("JC-2"), demand("JC-3", "DOVE SOAP 75G")]))
+    demand_panel.update_demand_matches(catalog(available=True))
+    listed = demand_panel.fulfillable_demands()
+    assert listed["Service No."].tolist() == ["JC-1", "JC-2", "JC-3"]
+
+    first = listed["Demand No"].iloc[0]
+    assert demand_panel.mark_demands_fulfilled([first]) == 1
+    # Marking it again changes nothing
+    assert demand_panel.mark_demands_fulfilled([first]) == 0
+    assert demand_panel.fulfillable_demands()["Service No."].tolist() == ["JC-2", "JC-3"]
+
+
+def test_demands_leave_the_list_when_the_item_runs_out():
+    demand_panel.save_demand_data(pd.DataFrame([demand("JC-1")]))
+    demand_panel.update_demand_matches(catalog(available=True))
+    assert len(demand_panel.fulfillable_demands()) == 1
+    demand_panel.update_demand_matches(catalog(available=False))
+    assert demand_panel.fulfillable_demands().empty
@@ -0,0 +1,104 @@
+"""
+The vectorized process_data must give the same rows as the original row-wise one.
+"""
+import itertools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import stock_catalog
+from benchmarks.synthetic import make_stock_sheet, write_stock_workbook
+
+
+def legacy_process_data(data):
+    # process_data as it was before it was vectorized, kept as the reference
+    required_columns = ['Index No', 'Item Description', 'RRATE', 'Closing']
+
+    def has_special_characters(value):
+        if isinstance(value, str):
+            return bool(re.search(r'[^\w\s]', value))
+        return False
+
+    data = data.dropna(subset=required_columns)
+    data = data[~data['Index No'].apply(has_special_characters)]
+    data = data[~data['Item Description'].str.contains(r'-{2,}', na=False)]
+    data = data.dropna(subset=['Item Description']).copy()
+
+    def format_price(value):
+        try:
+            if pd.notnull(value) and value != 0:
+                return f"{float(value):.2f}"
+            else:
+                return 'Soon Available'
+        except ValueError:
+            return 'Soon Available'
+
+    data['Price'] = data['RRATE'].apply(format_price)
+    data['Available'] = data['Closing'].apply(lambda x: 'YES' if pd.notnull(x) and x != 0 else 'SOON AVAILABLE')
+    data = data[['Index No', 'Item Description', 'Price', 'Available']]
+
+    data.reset_index(drop=True, inplace=True)
+    data.index += 1
+    data.index.name = 'S.No'
+    data.reset_index(inplace=True)
+    return data
+
+
+def assert_same_rows(data):
+    expected = legacy_process_data(data)
+    actual = stock_catalog.process_data(data)
+    assert len(actual) == len(expected)
+    for column in ['S.No', 'Price', 'Available']:
+        assert actual[column].tolist() == expected[column].tolist(), column
+    # Index No and the description are passed through untouched, so compare them as text
+    for column in ['Index No', 'Item Description']:
+        assert actual[column].astype(str).tolist() == expected[column].astype(str).tolist(), column
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_legacy_on_synthetic_sheets(seed):
+    assert_same_rows(make_stock_sheet(2000, seed))
+
+
+# Rates and closing stock that have tripped up the price and availability rules
+AWKWARD_VALUES = [0, 0.0, '0', 'abc', '', True, False, 'nan', '1_000', '١٢٣', np.nan, None, 12.5, '45.50', -3]
+
+
+def test_matches_legacy_on_awkward_rates_and_closing():
+    pairs = list(itertools.product(AWKWARD_VALUES, AWKWARD_VALUES))
+    data = pd.DataFrame({
+        'Index No': range(1000, 1000 + len(pairs)),
+        'Item Description': [f"ITEM {i}" for i in range(len(pairs))],
+        'RRATE': [rate for rate, _ in pairs],
+        'Closing': [closing for _, closing in pairs],
+    })
+    assert_same_rows(data)
+
+
+def test_matches_legacy_on_awkward_index_numbers():
+    index_nos = [1001, '1002', 1003.0, '1004/A', 'CSD-5', 'ABC', ' 7 ', '८', None, np.nan, 'x.y', '10 11']
+    data = pd.DataFrame({
+        'Index No': index_nos,
+        'Item Description': ['SOAP', '----- GROCERY -----', 'TEA', 'OIL', 'RICE', 'DAL', 'A--B', 'SUGAR', 'SALT', 'JAM', 'GHEE', None],
+        'RRATE': [10] * len(index_nos),
+        'Closing': [1] * len(index_nos),
+    })
+    assert_same_rows(data)
+
+
+def test_snapshot_matches_read_excel(tmp_path):
+    path = write_stock_workbook(str(tmp_path / "CANTEEN_STOCK_SUMMARY_TEST.xlsx"), 3000, seed=7)
+    stock_catalog.write_snapshot(path, progress=None)
+    catalog = stock_catalog.read_snapshot(path)
+    expected = stock_catalog.process_data(pd.read_excel(path, engine='openpyxl'))
+
+    assert catalog is not None
+    snapshot = catalog.processed
+    assert snapshot['S.No'].tolist() == expected['S.No'].tolist()
+    for column in ['Index No', 'Item Description', 'Price', 'Available']:
+        assert snapshot[column].tolist() == stock_catalog._text_column(expected[column]).tolist(), column
+    stock_catalog.delete_snapshot(path)
+    assert not os.path.exists(stock_catalog.snapshot_path(path))
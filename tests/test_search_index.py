@@ -0,0 +1,100 @@
+"""
+SearchIndex must find exactly what a literal scan of the descriptions finds, and
+PrefixCompleter what checking every description would.
+"""
+import random
+
+import pytest
+
+from benchmarks.synthetic import item_description
+from search_index import PrefixCompleter, SearchIndex
+
+
+def make_descriptions(count, seed=0):
+    rnd = random.Random(seed)
+    descriptions = [item_description(rnd, i) for i in range(count)]
+    # Descriptions with characters a regular expression would treat specially, and repeats
+    descriptions += ["AMUL (500G) C++ SUGAR", "RIN 1+1 PACK", "TATA TEA 1.5KG", "DOVE  SOAP", "amul butter 100g", "AMUL BUTTER 100G"]
+    return descriptions
+
+
+DESCRIPTIONS = make_descriptions(3000)
+INDEX = SearchIndex(DESCRIPTIONS)
+
+QUERIES = [
+    "amul", "AMUL BUTTER", "butter 1", "(500g)", "c++", "1+1", "1.5", "pack of", "ma", "a", "g", " ", "zzz",
+    "100g amul", "amul 100g", "tea 1kg", "soap dove", "1+1 rin", "oil (500g)", "nestle noodles 5kg",
+]
+
+
+def literal_scan(query):
+    # What str.contains(case=False, regex=False) over the descriptions gives
+    query = query.lower()
+    return [i for i, text in enumerate(DESCRIPTIONS) if query in text.lower()]
+
+
+def every_word_scan(query):
+    words = query.lower().split()
+    return [i for i, text in enumerate(DESCRIPTIONS) if all(word in text.lower() for word in words)]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_literal_scan(query):
+    assert INDEX.search(query) == literal_scan(query)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_all_words_search_matches_word_scan(query):
+    assert INDEX.search(query, all_words=True) == every_word_scan(query)
+
+
+def test_all_words_finds_words_in_any_order():
+    index = SearchIndex(["AMUL BUTTER 100G", "AMUL CHEESE 200G", "DOVE SOAP 100G"])
+    assert index.search("amul 100g", all_words=True) == [0]
+    assert index.search("amul 100g") == []
+
+
+def test_index_reusing_previous_grams_matches_fresh_index():
+    changed = DESCRIPTIONS[:1000] + make_descriptions(500, seed=1)
+    reused = SearchIndex(changed, previous=INDEX)
+    fresh = SearchIndex(changed)
+    assert reused.postings == fresh.postings
+    assert reused.gram_counts == fresh.gram_counts
+
+
+def test_fuzzy_search_tolerates_spelling_mistakes():
+    index = SearchIndex(["AMUL BUTTER 100G", "DOVE SOAP 75G", "TATA TEA 1KG"])
+    position, score = index.fuzzy_search("amul buter", limit=1)[0]
+    assert position == 0 and score >= 80
+    assert index.fuzzy_search("xq") == []
+
+
+def word_start_completions(descriptions, prefix):
+    # Every distinct description with a word sequence starting with the prefix
+    prefix = " ".join(prefix.lower().split())
+    found = []
+    for text in dict.fromkeys(descriptions):
+        words = text.lower().split()
+        if any(" ".join(words[i:]).startswith(prefix) for i in range(len(words))):
+            found.append(text)
+    return found
+
+
+@pytest.mark.parametrize("prefix", ["a", "amul", "AMUL B", "butter", "(500", "1+1", "pack of", "c++ s", "dove  soap", "zzz"])
+def test_completer_finds_every_word_start(prefix):
+    completer = PrefixCompleter(DESCRIPTIONS)
+    expected = word_start_completions(DESCRIPTIONS, prefix)
+    completions = completer.complete(prefix, limit=len(DESCRIPTIONS))
+    assert sorted(completions) == sorted(expected)
+
+    # Descriptions starting with the prefix come first, alphabetically
+    normalized = " ".join(prefix.lower().split())
+    leading = [text for text in completions if " ".join(text.lower().split()).startswith(normalized)]
+    assert completions[:len(leading)] == leading
+    assert leading == sorted(leading, key=lambda text: " ".join(text.lower().split()))
+
+
+def test_completer_limit_and_empty_prefix():
+    completer = PrefixCompleter(DESCRIPTIONS)
+    assert len(completer.complete("a", limit=5)) == 5
+    assert completer.complete("   ") == []
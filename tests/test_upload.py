@@ -0,0 +1,146 @@
+"""
+An upload is processed off to the side and swapped in whole; readers see the old stock or the new, never a mix.
+"""
+import io
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import pytest
+
+import stock_catalog
+
+
+def workbook(descriptions):
+    # Bytes of a stock summary listing the given items, all in stock
+    data = pd.DataFrame({
+        'Index No': range(1001, 1001 + len(descriptions)),
+        'Item Description': descriptions,
+        'RRATE': [10] * len(descriptions),
+        'Closing': [1] * len(descriptions),
+    })
+    buffer = io.BytesIO()
+    data.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def items(prefix, count=200):
+    return [f"{prefix} ITEM {i}" for i in range(count)]
+
+
+@pytest.fixture
+def upload_dir():
+    # Snapshots are named after the workbook, so every test gets workbooks of its own
+    stock_catalog.invalidate_catalog()
+    path = tempfile.mkdtemp(prefix="uploads-", dir=os.getcwd())
+    yield path
+    for name in os.listdir(path):
+        stock_catalog.delete_snapshot(os.path.join(path, name))
+
+
+def put(directory, name, descriptions):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(workbook(descriptions))
+    return path
+
+
+def seen_rows(directory):
+    merged = stock_catalog.get_merged_catalog(directory)
+    if merged is None:
+        return None
+    return frozenset(zip(merged.processed['Source'], merged.processed['Item Description']))
+
+
+def rows_of(**workbooks):
+    return frozenset((source, text) for source, descriptions in workbooks.items() for text in descriptions)
+
+
+def publish_while_reading(directory, data, target, replaces=()):
+    # Publish an upload while another thread keeps reading the merged catalog; returns the job and every view read
+    views = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            views.append(seen_rows(directory))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        job = stock_catalog.stage_upload(data, target, replaces)
+        job.future.result(timeout=60)
+    finally:
+        stop.set()
+        reader.join()
+    views.append(seen_rows(directory))
+    return job, views
+
+
+def staging_left():
+    return os.listdir(stock_catalog.STAGING_DIR)
+
+
+def test_upload_replaces_a_live_file_of_the_same_name(upload_dir):
+    target = put(upload_dir, "SAME_NAME_A.xlsx", items("OLD"))
+    put(upload_dir, "SAME_NAME_B.xlsx", items("OTHER", 50))
+    old = rows_of(SAME_NAME_A=items("OLD"), SAME_NAME_B=items("OTHER", 50))
+    new = rows_of(SAME_NAME_A=items("NEW"), SAME_NAME_B=items("OTHER", 50))
+    assert seen_rows(upload_dir) == old
+
+    job, views = publish_while_reading(upload_dir, workbook(items("NEW")), target)
+
+    assert job.error is None and job.warning is None
+    assert set(views) <= {old, new}
+    assert views[-1] == new
+    assert stock_catalog.stock_files(upload_dir) == [target, os.path.join(upload_dir, "SAME_NAME_B.xlsx")]
+    assert staging_left() == []
+
+
+def test_upload_replaces_other_files(upload_dir):
+    kept = put(upload_dir, "REPLACING_A.xlsx", items("KEPT", 50))
+    replaced = put(upload_dir, "REPLACING_B.xlsx", items("OLD"))
+    old = rows_of(REPLACING_A=items("KEPT", 50), REPLACING_B=items("OLD"))
+    new = rows_of(REPLACING_A=items("KEPT", 50), REPLACING_C=items("NEW"))
+    assert seen_rows(upload_dir) == old
+
+    target = os.path.join(upload_dir, "REPLACING_C.xlsx")
+    job, views = publish_while_reading(upload_dir, workbook(items("NEW")), target, [replaced])
+
+    assert job.error is None and job.warning is None
+    assert set(views) <= {old, new}
+    assert views[-1] == new
+    assert stock_catalog.stock_files(upload_dir) == [kept, target]
+    assert not os.path.exists(stock_catalog.snapshot_path(replaced))
+    assert staging_left() == []
+
+
+def test_corrupt_upload_leaves_the_live_stock_alone(upload_dir):
+    target = put(upload_dir, "CORRUPT_A.xlsx", items("OLD"))
+    old = rows_of(CORRUPT_A=items("OLD"))
+    assert seen_rows(upload_dir) == old
+    with open(target, "rb") as f:
+        live_bytes = f.read()
+
+    job, views = publish_while_reading(upload_dir, b"PK\x03\x04 not a workbook", target)
+
+    assert job.error
+    assert set(views) == {old}
+    with open(target, "rb") as f:
+        assert f.read() == live_bytes
+    assert os.path.exists(stock_catalog.snapshot_path(target))
+    assert staging_left() == []
+
+
+def test_upload_missing_columns_is_refused(upload_dir):
+    target = put(upload_dir, "MISSING_COLUMNS_A.xlsx", items("OLD"))
+    buffer = io.BytesIO()
+    pd.DataFrame({'Item Description': items("NEW")}).to_excel(buffer, index=False)
+
+    job = stock_catalog.stage_upload(buffer.getvalue(), target)
+    job.future.result(timeout=60)
+
+    assert job.error
+    assert seen_rows(upload_dir) == rows_of(MISSING_COLUMNS_A=items("OLD"))
+    assert staging_left() == []